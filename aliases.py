@@ -0,0 +1,58 @@
+import threading
+
+# Known slug variants -> canonical page slug (slug_aliases table), e.g. the
+# slug of a question that was answered by a near-duplicate page. Kept
+# flat: an alias always points straight at a page, never at another
+# alias, so resolving is one dict lookup and one redirect.
+
+
+class AliasMap:
+
+    def __init__(self):
+        self._aliases = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._aliases)
+
+    def resolve(self, slug: str) -> str:
+        return self._aliases.get(slug, slug)
+
+    def add(self, alias: str, slug: str):
+        with self._lock:
+            slug = self._aliases.get(slug, slug)
+            if alias == slug:
+                return
+            self._aliases[alias] = slug
+            # Anything that pointed at the new alias now skips it
+            for other, target in self._aliases.items():
+                if target == alias:
+                    self._aliases[other] = slug
+
+    def load(self, cursor):
+        cursor.execute("SELECT alias, slug FROM slug_aliases")
+        aliases = dict(cursor.fetchall())
+        with self._lock:
+            self._aliases = aliases
+
+
+def save(cursor, alias: str, slug: str):
+    # Store alias -> slug, flattening chains on both sides. Returns the
+    # canonical slug and every alias that now leads to it by a new route
+    # (alias itself plus older aliases of alias), or None for a no-op.
+    cursor.execute("SELECT slug FROM slug_aliases WHERE alias=%s", (slug,))
+    row = cursor.fetchone()
+    if row:
+        slug = row[0]
+    if alias == slug:
+        return None
+
+    cursor.execute("""
+        INSERT INTO slug_aliases (alias, slug) VALUES (%s, %s)
+        ON CONFLICT (alias) DO UPDATE SET slug = EXCLUDED.slug
+    """, (alias, slug))
+    cursor.execute("UPDATE slug_aliases SET slug=%s WHERE slug=%s RETURNING alias", (slug, alias))
+    return slug, [alias] + [r[0] for r in cursor.fetchall()]
+
+
+slug_aliases = AliasMap()
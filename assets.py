@@ -0,0 +1,54 @@
+import os
+import hashlib
+import logging
+
+import http_cache
+
+# Shared CSS / JS emitted as content-hashed files (app.<hash>.css) so they
+# can be cached for a year: new content means a new name.
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+MEDIA_TYPES = {
+    "css": "text/css; charset=utf-8",
+    "js": "text/javascript; charset=utf-8",
+}
+
+logger = logging.getLogger("rulemate")
+
+# filename -> Asset
+registry = {}
+
+
+class Asset:
+
+    def __init__(self, name, ext, content):
+        body = content.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:12]
+        self.filename = f"{name}.{digest}.{ext}"
+        self.url = f"/static/{self.filename}"
+        self.entry = http_cache.CachedBody(body, MEDIA_TYPES[ext], etag=f'"{digest}"')
+        registry[self.filename] = self
+
+    def write(self, directory=STATIC_DIR):
+        path = os.path.join(directory, self.filename)
+        if os.path.exists(path):
+            return False
+        # Write then rename: other workers never see a half-written file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.entry.body)
+        os.replace(tmp, path)
+        return True
+
+
+def get(filename):
+    return registry.get(filename)
+
+
+def write_all(directory=STATIC_DIR):
+    for asset in registry.values():
+        try:
+            asset.write(directory)
+        except OSError as e:
+            logger.warning(f"could not write {asset.filename}: {e}")
@@ -0,0 +1,80 @@
+"""Fill the precomputed render columns for pages stored before they existed.
+
+    python backfill.py --batch-size 500
+
+Walks pages missing any of meta_summary / clean_question / related_slugs /
+structured_data in slug order, one batch per transaction, and writes the
+same values insert_pages computes for new rows. Safe to stop and rerun:
+finished rows are no longer selected. Rendered pages already in a
+worker's page cache are unaffected either way, the output is identical.
+"""
+import os
+import json
+import argparse
+
+import psycopg2.extras
+
+# main builds the OpenAI client at import; nothing here calls it
+os.environ.setdefault("OPENAI_API_KEY", "backfill")
+
+import db  # noqa: E402
+import main  # noqa: E402
+import migrations  # noqa: E402
+
+
+def fetch_batch(cursor, after, limit):
+    cursor.execute("""
+        SELECT slug, question, answer, related FROM pages
+        WHERE slug > %s
+          AND (meta_summary IS NULL OR clean_question IS NULL
+               OR related_slugs IS NULL OR structured_data IS NULL)
+        ORDER BY slug
+        LIMIT %s
+    """, (after, limit))
+    return cursor.fetchall()
+
+
+def backfill(batch_size=500, log=print):
+    after = ""
+    total = 0
+    while True:
+        with db.cursor() as cursor:
+            rows = fetch_batch(cursor, after, batch_size)
+            if not rows:
+                break
+
+            updates = []
+            for slug, question, answer, related_json in rows:
+                try:
+                    related = json.loads(related_json) if related_json else []
+                except ValueError:
+                    related = []
+                updates.append((slug, *main.page_render_fields(question or "", answer or "", related)))
+
+            psycopg2.extras.execute_values(cursor, """
+                UPDATE pages SET
+                    meta_summary = v.meta_summary,
+                    clean_question = v.clean_question,
+                    related_slugs = v.related_slugs,
+                    structured_data = v.structured_data
+                FROM (VALUES %s) AS v (slug, meta_summary, clean_question, related_slugs, structured_data)
+                WHERE pages.slug = v.slug
+            """, updates)
+
+        total += len(rows)
+        after = rows[-1][0]
+        log(f"{total} rows backfilled (last: {after})")
+
+    return total
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill precomputed page render columns")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per UPDATE transaction")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    migrations.migrate()
+    print(f"Done: {backfill(args.batch_size)} row(s)")
@@ -0,0 +1,223 @@
+"""Offline micro-benchmarks for the per-request pure functions.
+
+    python benchmarks/bench.py                    # run, compare to baseline
+    python benchmarks/bench.py --update-baseline  # record a new baseline
+
+Each benchmark runs one pass over the corpus in benchmarks/corpus.py
+and reports throughput (ops/sec, best of --repeat runs) and the peak
+bytes allocated during one pass (tracemalloc). Results are compared with
+benchmarks/baseline.json. The process exits non-zero when ops/sec
+drops, or allocations grow, by more than --threshold. The baseline is
+machine-specific (and gitignored), so record it on the machine that runs
+the check.
+
+No OpenAI key or database is needed: nothing here calls the model or
+opens a connection.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+# main builds the OpenAI client at import; it is never called here
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+import main  # noqa: E402
+from corpus import QUESTIONS, ANSWERS, RELATED, RELATED_OUTPUTS, CATEGORY_ROWS  # noqa: E402
+
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+
+QUESTION_PAGES = [
+    (
+        main.slugify(main.clean_question_text(q)),
+        q,
+        ANSWERS[i % len(ANSWERS)],
+        json.dumps(RELATED[i % len(RELATED)]),
+    )
+    for i, q in enumerate(QUESTIONS)
+]
+
+# Same pages as stored since the precomputed render columns
+QUESTION_ROWS = [
+    (slug, q, answer, related, *main.page_render_fields(q, answer, json.loads(related)))
+    for slug, q, answer, related in QUESTION_PAGES
+]
+
+
+def bench_slugify():
+    for q in QUESTIONS:
+        main.slugify(q)
+    return len(QUESTIONS)
+
+
+def bench_clean_question_text():
+    for q in QUESTIONS:
+        main.clean_question_text(q)
+    return len(QUESTIONS)
+
+
+def bench_is_ai_fragment():
+    for q in QUESTIONS:
+        main.is_ai_fragment(q)
+    return len(QUESTIONS)
+
+
+def bench_has_legal_keyword():
+    for q in QUESTIONS:
+        main.has_legal_keyword(q)
+    return len(QUESTIONS)
+
+
+def bench_parse_related():
+    for content in RELATED_OUTPUTS:
+        main.parse_related(content)
+    return len(RELATED_OUTPUTS)
+
+
+def bench_extract_meta_summary():
+    for answer in ANSWERS:
+        main.extract_meta_summary(answer)
+    return len(ANSWERS)
+
+
+def bench_render_question_page():
+    for page in QUESTION_PAGES:
+        main.render_question_page(*page)
+    return len(QUESTION_PAGES)
+
+
+def bench_render_question_page_stored():
+    for row in QUESTION_ROWS:
+        main.render_question_page(*row)
+    return len(QUESTION_ROWS)
+
+
+def bench_render_category_page():
+    main.render_category_page(
+        "traffic-rules-india", CATEGORY_ROWS,
+        "/category/traffic-rules-india?before=x", "/category/traffic-rules-india?after=y"
+    )
+    return 1
+
+
+BENCHMARKS = {
+    "slugify": bench_slugify,
+    "clean_question_text": bench_clean_question_text,
+    "is_ai_fragment": bench_is_ai_fragment,
+    "has_legal_keyword": bench_has_legal_keyword,
+    "parse_related": bench_parse_related,
+    "extract_meta_summary": bench_extract_meta_summary,
+    "render_question_page": bench_render_question_page,
+    "render_question_page_stored": bench_render_question_page_stored,
+    "render_category_page": bench_render_category_page,
+}
+
+
+def measure(fn, min_time, repeat):
+    # Calibrate the loop count so one run takes ~min_time
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            ops = fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, time.perf_counter() - start)
+
+    ops_per_sec = loops * ops / best
+
+    # Peak bytes allocated while running one pass over the corpus
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"ops_per_sec": ops_per_sec, "peak_bytes": peak - base}
+
+
+def compare(name, result, baseline, threshold):
+    # Returns a list of regression messages
+    if baseline is None:
+        return []
+
+    problems = []
+    if result["ops_per_sec"] < baseline["ops_per_sec"] * (1 - threshold):
+        problems.append(
+            f"{name}: {result['ops_per_sec']:,.0f} ops/s vs baseline {baseline['ops_per_sec']:,.0f}"
+        )
+    # Small absolute slack so a few stray bytes don't fail the run
+    if result["peak_bytes"] > baseline["peak_bytes"] * (1 + threshold) + 64:
+        problems.append(
+            f"{name}: peak {result['peak_bytes']:,} B vs baseline {baseline['peak_bytes']:,}"
+        )
+    return problems
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--update-baseline", action="store_true", help="write results to baseline.json")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression fraction (default 0.25)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timed run")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs, best one is kept")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args(argv)
+
+    names = args.names or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    problems = []
+    print(f"{'benchmark':<28} {'ops/sec':>14} {'peak B':>10} {'vs baseline':>12}")
+    for name in names:
+        result = measure(BENCHMARKS[name], args.min_time, args.repeat)
+        results[name] = result
+
+        previous = baseline.get(name)
+        change = ""
+        if previous:
+            change = f"{result['ops_per_sec'] / previous['ops_per_sec'] - 1:+.1%}"
+        print(f"{name:<28} {result['ops_per_sec']:>14,.0f} {result['peak_bytes']:>10,} {change:>12}")
+
+        if not args.update_baseline:
+            problems += compare(name, result, previous, args.threshold)
+
+    if args.update_baseline or not baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+
+    if problems:
+        print("\nREGRESSIONS:")
+        for p in problems:
+            print(f"  {p}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,130 @@
+# Realistic /ask traffic for the offline benchmarks: questions the way users
+# type them (numbering, odd spacing, punctuation) and answers in the
+# SHORT ANSWER / DETAILS / SOURCE format the model returns.
+
+QUESTIONS = [
+    "What is the fine for not wearing a helmet in India?",
+    "1. What is the penalty for driving without a licence?",
+    "2) How to apply for a new passport online",
+    "How can I renew my driving license after it expires?",
+    "What is Section 420 of the IPC?",
+    "Is it mandatory to link Aadhaar with PAN card?",
+    "What documents are needed for passport renewal?",
+    "How to file an FIR online in Delhi",
+    "What is the punishment for drunk driving in India?",
+    "Can police seize my vehicle for not having PUC certificate?",
+    "What are my rights if I am arrested by the police?",
+    "How to get anticipatory bail in India",
+    "What is the income tax slab for senior citizens?",
+    "Last date to file income tax return for AY 2025-26",
+    "How to update address in Aadhaar card online",
+    "What is the fine for jumping a red light?",
+    "3 - What is Article 21 of the Constitution of India?",
+    "How to register a complaint against a builder under RERA",
+    "What is the process for voter ID registration?",
+    "Is GST applicable on residential rent?",
+    "How to apply for a ration card in Maharashtra",
+    "What is the penalty for overspeeding under the Motor Vehicles Act?",
+    "Can a minor open a bank account in India?",
+    "What is the legal age of marriage in India?",
+    "How to get a police clearance certificate for abroad",
+    "What is the penalty for late filing of GST returns?",
+    "How many days does tatkal passport take?",
+    "What happens if I lose my PAN card?",
+    "Can a tenant be evicted without notice in India?",
+    "What is the fine for using a mobile phone while driving?",
+    "certainly, here are some related questions",
+    "and what about two wheelers",
+    "hello",
+    "best pizza near me",
+    "What is the weather like in Mumbai today and tomorrow?",
+    "How do I cook biryani at home for a party of ten people?",
+]
+
+ANSWERS = [
+    """SHORT ANSWER:
+Riding a two-wheeler without a helmet attracts a fine of Rs 1,000 and the licence can be suspended for 3 months.
+DETAILS:
+- Applies to both the rider and the pillion rider.
+- Helmet must conform to BIS standards.
+- States may add their own compounding fees.
+PUNISHMENT / IMPLICATIONS (if applicable):
+- Rs 1,000 fine under Section 194D.
+- Licence disqualification for 3 months.
+SOURCE:
+- Motor Vehicles (Amendment) Act, 2019
+""",
+    """SHORT ANSWER:
+You can apply for a passport online through the Passport Seva portal and then visit a Passport Seva Kendra for verification.
+DETAILS:
+- Register on passportindia.gov.in and fill the application form.
+- Pay the fee online and book an appointment.
+- Carry original documents (proof of address, date of birth) to the PSK.
+- Police verification follows the appointment.
+SOURCE:
+- Ministry of External Affairs, Passports Act, 1967
+""",
+    """SHORT ANSWER:
+Section 420 IPC deals with cheating and dishonestly inducing delivery of property.
+DETAILS:
+- It is a cognizable and non-bailable offence.
+- It is triable by a Magistrate of the first class.
+- Under the Bharatiya Nyaya Sanhita it corresponds to Section 318.
+PUNISHMENT / IMPLICATIONS (if applicable):
+- Imprisonment up to 7 years and fine.
+SOURCE:
+- Indian Penal Code, 1860 / Bharatiya Nyaya Sanhita, 2023
+""",
+    """SHORT ANSWER:
+Every arrested person has the right to know the grounds of arrest, to consult a lawyer and to be produced before a Magistrate within 24 hours.
+DETAILS:
+- Right to inform a relative or friend about the arrest.
+- Right to medical examination.
+- Women can generally not be arrested after sunset and before sunrise.
+- Right to free legal aid if you cannot afford a lawyer.
+SOURCE:
+- Constitution of India, Article 22
+- Code of Criminal Procedure / BNSS, 2023
+""",
+    "I am not sure about this. Please check the official notification of the department concerned.",
+    """SHORT ANSWER:
+Late filing of GSTR-3B attracts a late fee of Rs 50 per day ("Rs 20 per day" for nil returns) plus 18% interest on tax due.
+DETAILS:
+- Late fee is capped based on turnover.
+- Interest runs from the due date to the date of payment.
+SOURCE:
+- Central Goods and Services Tax Act, 2017, Section 47
+""",
+]
+
+RELATED = [
+    [
+        "What is the fine for riding without a helmet for pillion riders?",
+        "Which helmets are ISI certified in India?",
+        "Can police seize my bike for not wearing a helmet?",
+        "Is a helmet mandatory for Sikh riders?",
+    ],
+    [
+        "1. How long does passport police verification take?",
+        "2. What documents are needed for a fresh passport?",
+        "3. How to apply for a tatkal passport",
+        "4. Can I change my address in the passport?",
+    ],
+    [
+        "What is the difference between Section 406 and 420 IPC?",
+        "Is Section 420 bailable?",
+        "How to file a cheating complaint with the police",
+        "What is Section 318 of the Bharatiya Nyaya Sanhita?",
+    ],
+    [],
+]
+
+RELATED_OUTPUTS = [
+    "1. What is the fine for riding without a helmet?\n2. Can police seize my bike?\n3. Is a helmet mandatory for children?\n4. Which helmets are BIS certified?",
+    "Certainly! Here are 4 related questions:\n- How to renew a passport?\n- What is tatkal passport?\n- And what about minors?\n- What documents are needed for passport?\n- How long is police verification?",
+]
+
+CATEGORY_ROWS = [
+    (f"question-{i:04d}-about-traffic-rules", f"{i}. {QUESTIONS[i % len(QUESTIONS)]}")
+    for i in range(50)
+]
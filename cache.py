@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import metrics
+
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "10000"))
+STATIC_CACHE_MAX_BYTES = int(os.getenv("STATIC_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+class LRUCache:
+    # Thread-safe LRU with a per-entry TTL and a total size bound.
+    #
+    # Size is whatever sizeof(value) says (bytes of the rendered page by
+    # default); least recently used entries are evicted until the total
+    # fits under max_bytes again.
+
+    def __init__(self, max_bytes, ttl, sizeof=None, name="cache"):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof or (lambda value: len(value))
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                metrics.CACHE_REQUESTS.inc(cache=self.name, result="miss")
+                return None
+
+            expires, size, value = entry
+            if time.monotonic() > expires:
+                del self._entries[key]
+                self._bytes -= size
+                self.misses += 1
+                metrics.CACHE_REQUESTS.inc(cache=self.name, result="miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.CACHE_REQUESTS.inc(cache=self.name, result="hit")
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[key] = (expires, size, value)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def invalidate_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Rendered /{slug} and /category/{category} bodies (http_cache.CachedBody)
+page_cache = LRUCache(PAGE_CACHE_MAX_BYTES, PAGE_CACHE_TTL, name="page")
+
+# Files under static/ (http_cache.CachedBody), keyed by path + mtime + size
+static_cache = LRUCache(STATIC_CACHE_MAX_BYTES, 24 * 3600, name="static")
+
+# is_legal_question verdicts in front of the legal_verdicts table
+# (sized in entries: every verdict counts as 1)
+verdict_cache = LRUCache(VERDICT_CACHE_SIZE, 24 * 3600, sizeof=lambda verdict: 1, name="verdict")
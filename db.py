@@ -0,0 +1,305 @@
+import os
+import hashlib
+import time
+import select
+import logging
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from dotenv import load_dotenv
+
+import usage
+
+load_dotenv()
+
+logger = logging.getLogger("rulemate")
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Pool sizing / recycling knobs
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+# Connections idle longer than this get a "SELECT 1" before being handed out
+POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30"))
+# Managed Postgres needs TLS; a local one (load tests) usually has none
+DATABASE_SSLMODE = os.getenv("DATABASE_SSLMODE", "require")
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    # Bounded, thread-safe pool of psycopg2 connections.
+    #
+    # Idle connections are reused LIFO so the hot ones stay warm, checked
+    # with a cheap query when they have been idle for a while, and recycled
+    # once they pass max_lifetime so server-side memory / TLS state does
+    # not grow forever.
+
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=10.0,
+                 max_lifetime=1800.0, health_check_after=30.0, **connect_kwargs):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.connect_kwargs = connect_kwargs
+
+        self._idle = []      # [(conn, created_at, last_used)]
+        self._created = {}   # id(conn) -> created_at for checked-out conns
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    # ---- internals ----
+
+    def _connect(self):
+        usage.count("db_connects")
+        return psycopg2.connect(self.dsn, **self.connect_kwargs)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, created_at, now):
+        return self.max_lifetime and now - created_at > self.max_lifetime
+
+    def _healthy(self, conn, last_used, now):
+        if conn.closed:
+            return False
+        if now - last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # ---- public API ----
+
+    def getconn(self):
+        usage.count("db_checkouts")
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("connection pool is closed")
+
+                if self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                elif self._size < self.max_size:
+                    # Reserve a slot, connect outside the lock
+                    self._size += 1
+                    conn = None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"no database connection available after {self.timeout}s"
+                        )
+                    self._cond.wait(remaining)
+                    continue
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created[id(conn)] = time.monotonic()
+                return conn
+
+            now = time.monotonic()
+            if self._expired(created_at, now) or not self._healthy(conn, last_used, now):
+                self._discard(conn)
+                with self._cond:
+                    self._size -= 1
+                continue
+
+            with self._cond:
+                self._created[id(conn)] = created_at
+            return conn
+
+    def putconn(self, conn, discard=False):
+        now = time.monotonic()
+
+        with self._cond:
+            created_at = self._created.pop(id(conn), now)
+
+        if not discard and not conn.closed:
+            try:
+                # Never hand out a connection with an open transaction
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or conn.closed or self._closed or self._expired(created_at, now):
+                self._size -= 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, created_at, now))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        # Commits on success, rolls back (and drops broken conns) on error
+        conn = self.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            # BaseException too: a closed streaming generator raises GeneratorExit
+            broken = bool(conn.closed)
+            if not broken:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            self.putconn(conn, discard=broken)
+            raise
+        else:
+            self.putconn(conn)
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
+
+    def warm(self):
+        # Open min_size connections up front so the first requests don't pay
+        conns = [self.getconn() for _ in range(self.min_size)]
+        for conn in conns:
+            self.putconn(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+
+pool = ConnectionPool(
+    DATABASE_URL,
+    min_size=POOL_MIN_SIZE,
+    max_size=POOL_MAX_SIZE,
+    timeout=POOL_TIMEOUT,
+    max_lifetime=POOL_MAX_LIFETIME,
+    health_check_after=POOL_HEALTH_CHECK_AFTER,
+    sslmode=DATABASE_SSLMODE,
+)
+
+
+def connection():
+    return pool.connection()
+
+
+def cursor():
+    return pool.cursor()
+
+
+def dedicated_connection():
+    # Outside the pool, for sessions held a long time (locks, LISTEN);
+    # the caller closes it
+    return pool._connect()
+
+
+def advisory_lock_id(key: str) -> int:
+    # pg_advisory_lock takes a bigint; hash the text key into a signed int64
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def try_advisory_lock(conn, key: str) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (advisory_lock_id(key),))
+        acquired = cur.fetchone()[0]
+    conn.commit()
+    return acquired
+
+
+def notify(cur, channel: str, payload: str):
+    # Delivered to listeners when the surrounding transaction commits
+    cur.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+
+
+class Listener:
+    # LISTEN on some channels from one dedicated (non-pooled) connection in
+    # a background thread. handlers maps channel -> fn(payload). on_connect
+    # runs after every (re)connect so the caller can resync whatever it
+    # may have missed; on_disconnect runs when the connection drops
+    # (notifications are lost until the next on_connect).
+
+    def __init__(self, handlers, on_connect=None, on_disconnect=None, retry_delay=5.0):
+        self.handlers = dict(handlers)
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.retry_delay = retry_delay
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="pg-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _dispatch(self, notify):
+        try:
+            self.handlers[notify.channel](notify.payload)
+        except Exception as e:
+            logger.warning(f"listener {notify.channel} handler failed: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = dedicated_connection()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    for channel in self.handlers:
+                        cur.execute(f'LISTEN "{channel}"')
+                if self.on_connect:
+                    self.on_connect()
+
+                while not self._stop.is_set():
+                    if not select.select([conn], [], [], 1.0)[0]:
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0))
+            except Exception as e:
+                logger.warning(f"listener disconnected: {e}")
+                if self.on_disconnect:
+                    self.on_disconnect()
+                self._stop.wait(self.retry_delay)
+            finally:
+                if conn is not None:
+                    pool._discard(conn)
@@ -0,0 +1,217 @@
+import os
+import zlib
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Validators (ETag / Last-Modified), 304s, Cache-Control and compression
+# for the GET routes
+
+PAGE_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=86400"
+CATEGORY_CACHE_CONTROL = "public, max-age=600, stale-while-revalidate=3600"
+HOME_CACHE_CONTROL = "public, max-age=3600"
+SITEMAP_CACHE_CONTROL = "public, max-age=3600"
+ROBOTS_CACHE_CONTROL = "public, max-age=86400"
+STATIC_CACHE_CONTROL = "public, max-age=86400"
+# Content-hashed URLs never change meaning
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Bodies smaller than this go out as they are
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+# Bodies above this are sent in STREAM_CHUNK_SIZE pieces
+STREAM_THRESHOLD = int(os.getenv("STREAM_THRESHOLD", str(256 * 1024)))
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Preferred first
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/xml", "application/json", "application/javascript",
+    "application/manifest+json", "image/svg+xml",
+)
+
+
+def is_compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_stream(chunks, encoding: str):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def negotiate(request, available) -> str:
+    # Best of `available` the client accepts (q > 0), or None for identity
+    header = request.headers.get("accept-encoding")
+    if not header:
+        return None
+
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    for encoding in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def variant_etag(etag: str, encoding: str) -> str:
+    # Each encoding is its own representation, so its own strong ETag
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def _base_tag(tag: str) -> str:
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+def etag_for(*parts) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        h.update(b"\0")
+    return f'"{h.hexdigest()}"'
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def is_not_modified(request, etag, last_modified=None) -> bool:
+    # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {_base_tag(tag.strip()) for tag in if_none_match.split(",")}
+        return "*" in tags or _base_tag(etag) in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution
+        return int(last_modified) <= since
+
+    return False
+
+
+def is_conditional(request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def headers_for(etag, cache_control, last_modified=None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(etag, cache_control, last_modified=None) -> Response:
+    headers = headers_for(etag, cache_control, last_modified)
+    headers["Vary"] = "Accept-Encoding"
+    return Response(status_code=304, headers=headers)
+
+
+class CachedBody:
+    # A finished response body plus its validators, as kept in page_cache.
+    # Compressed once here; `encoded` holds every variant that came out
+    # smaller than the original.
+
+    __slots__ = ("body", "media_type", "etag", "last_modified", "encoded")
+
+    def __init__(self, body: bytes, media_type: str, etag=None, last_modified=None):
+        self.body = body
+        self.media_type = media_type
+        self.etag = etag or etag_for(body)
+        self.last_modified = last_modified
+        self.encoded = {}
+
+        if len(body) >= COMPRESS_MIN_SIZE and is_compressible(media_type):
+            for encoding in ENCODINGS:
+                data = compress(body, encoding)
+                if len(data) < len(body):
+                    self.encoded[encoding] = data
+
+    def __len__(self):
+        return len(self.body) + sum(len(data) for data in self.encoded.values())
+
+
+def _chunks(body: bytes):
+    view = memoryview(body)
+    for start in range(0, len(body), STREAM_CHUNK_SIZE):
+        yield bytes(view[start:start + STREAM_CHUNK_SIZE])
+
+
+def respond(request, entry: CachedBody, cache_control: str) -> Response:
+    encoding = negotiate(request, entry.encoded)
+    etag = variant_etag(entry.etag, encoding)
+    headers = headers_for(etag, cache_control, entry.last_modified)
+    if entry.encoded:
+        headers["Vary"] = "Accept-Encoding"
+
+    if is_not_modified(request, etag, entry.last_modified):
+        return Response(status_code=304, headers=headers)
+
+    body = entry.body
+    if encoding:
+        body = entry.encoded[encoding]
+        headers["Content-Encoding"] = encoding
+
+    if len(body) > STREAM_THRESHOLD:
+        headers["Content-Length"] = str(len(body))
+        return StreamingResponse(_chunks(body), media_type=entry.media_type, headers=headers)
+
+    return Response(content=body, media_type=entry.media_type, headers=headers)
+
+
+def stream(request, chunks, media_type: str, cache_control: str) -> StreamingResponse:
+    # Body built on the fly (bytes chunks): compressed as it streams
+    headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    encoding = negotiate(request, ENCODINGS) if is_compressible(media_type) else None
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        chunks = compress_stream(chunks, encoding)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
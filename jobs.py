@@ -0,0 +1,245 @@
+import os
+import json
+import random
+import asyncio
+import logging
+from collections import Counter
+
+from fastapi.concurrency import run_in_threadpool
+
+import db
+import metrics
+
+# Background jobs: rows in the jobs table, run by an in-process worker in
+# every uvicorn worker. Claims use FOR UPDATE SKIP LOCKED so workers never
+# take the same job; a job whose worker died is picked up again once its
+# lock is older than JOBS_LOCK_TIMEOUT.
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "4"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1.0"))
+JOBS_LOCK_TIMEOUT = float(os.getenv("JOBS_LOCK_TIMEOUT", "300"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+# Retry delay is JOBS_RETRY_BASE * 2^(attempt - 1) seconds, with jitter
+JOBS_RETRY_BASE = float(os.getenv("JOBS_RETRY_BASE", "10"))
+
+logger = logging.getLogger("rulemate")
+
+HANDLERS = {}
+# kind -> most jobs of that kind one worker runs at a time
+KIND_LIMITS = {}
+
+
+class Retry(Exception):
+    # Raised by a handler that can't run yet (e.g. out of budget):
+    # the job goes back to the queue after `delay` seconds without using
+    # up an attempt.
+    def __init__(self, delay, reason=""):
+        super().__init__(reason or f"retry in {delay:.0f}s")
+        self.delay = delay
+
+
+def handler(kind, concurrency=None):
+    # @jobs.handler("enrich_page") async def enrich_page(payload): ...
+    # With concurrency, the worker stops claiming jobs of this kind while
+    # that many are running.
+    def register(fn):
+        HANDLERS[kind] = fn
+        if concurrency is not None:
+            KIND_LIMITS[kind] = concurrency
+        return fn
+    return register
+
+
+def enqueue(kind, payload, priority=0, dedupe_key=None, delay=0,
+            max_attempts=JOBS_MAX_ATTEMPTS, cursor=None):
+    # Pass the cursor of an open transaction to enqueue atomically with it
+    # (then call worker.wake() once it has committed).
+    # Returns False when a job with the same dedupe_key is already pending.
+    if cursor is None:
+        with db.cursor() as cur:
+            queued = enqueue(kind, payload, priority, dedupe_key, delay, max_attempts, cur)
+        if queued:
+            worker.wake()
+        return queued
+
+    cursor.execute("""
+        INSERT INTO jobs (kind, payload, priority, dedupe_key, max_attempts, run_after)
+        VALUES (%s, %s, %s, %s, %s, NOW() + make_interval(secs => %s))
+        ON CONFLICT (dedupe_key) WHERE status IN ('queued', 'running') DO NOTHING
+        RETURNING id
+    """, (kind, json.dumps(payload), priority, dedupe_key, max_attempts, delay))
+    return cursor.fetchone() is not None
+
+
+def enqueue_many(kind, payloads, dedupe_keys, priority=0, max_attempts=JOBS_MAX_ATTEMPTS):
+    # A batch of jobs of one kind in one INSERT. dedupe_keys pairs with
+    # payloads. Returns how many were added (the rest were already pending).
+    if not payloads:
+        return 0
+    with db.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO jobs (kind, payload, priority, dedupe_key, max_attempts)
+            SELECT %s, payload::jsonb, %s, dedupe_key, %s
+            FROM unnest(%s::text[], %s::text[]) AS batch (payload, dedupe_key)
+            ON CONFLICT (dedupe_key) WHERE status IN ('queued', 'running') DO NOTHING
+            RETURNING id
+        """, (kind, priority, max_attempts, [json.dumps(p) for p in payloads], list(dedupe_keys)))
+        added = len(cursor.fetchall())
+    if added:
+        worker.wake()
+    return added
+
+
+def claim(skip_kinds=()):
+    # Next runnable job, leaving jobs of skip_kinds in the queue
+    with db.cursor() as cursor:
+        cursor.execute("""
+            UPDATE jobs SET status = 'running', locked_at = NOW(), attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE ((status = 'queued' AND run_after <= NOW())
+                       OR (status = 'running' AND locked_at < NOW() - make_interval(secs => %s)))
+                  AND kind <> ALL(%s)
+                ORDER BY priority DESC, run_after, id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, kind, payload, attempts, max_attempts
+        """, (JOBS_LOCK_TIMEOUT, list(skip_kinds)))
+        return cursor.fetchone()
+
+
+def finish(job_id):
+    with db.cursor() as cursor:
+        cursor.execute("DELETE FROM jobs WHERE id=%s", (job_id,))
+
+
+def fail(job_id, attempts, max_attempts, error):
+    # Back to the queue with exponential backoff, or parked as failed
+    with db.cursor() as cursor:
+        if attempts >= max_attempts:
+            cursor.execute("""
+                UPDATE jobs SET status = 'failed', locked_at = NULL, last_error = %s
+                WHERE id=%s
+            """, (error, job_id))
+            return False
+
+        delay = JOBS_RETRY_BASE * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+        cursor.execute("""
+            UPDATE jobs SET status = 'queued', locked_at = NULL, last_error = %s,
+                            run_after = NOW() + make_interval(secs => %s)
+            WHERE id=%s
+        """, (error, delay, job_id))
+        return True
+
+
+def release(job_id, delay=0):
+    # Shutdown mid-job or Retry: requeue without using up an attempt
+    with db.cursor() as cursor:
+        cursor.execute("""
+            UPDATE jobs SET status = 'queued', locked_at = NULL, attempts = attempts - 1,
+                            run_after = NOW() + make_interval(secs => %s)
+            WHERE id=%s AND status = 'running'
+        """, (delay, job_id))
+
+
+def depth():
+    with db.cursor() as cursor:
+        cursor.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status")
+        return {(kind, status): n for kind, status, n in cursor.fetchall()}
+
+
+class Worker:
+
+    def __init__(self, concurrency=JOBS_CONCURRENCY, poll_interval=JOBS_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._slots = None
+        self._wakeup = None
+        self._loop = None
+        self._task = None
+        self._running = set()
+        self._running_kinds = Counter()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(self._task, *self._running, return_exceptions=True)
+        self._task = None
+
+    def wake(self):
+        # Callable from any thread (enqueue usually runs in the threadpool)
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            # Cleared before claiming so a wake() during the claim isn't lost
+            self._wakeup.clear()
+            skip_kinds = [kind for kind, limit in KIND_LIMITS.items()
+                          if self._running_kinds[kind] >= limit]
+            try:
+                job = await run_in_threadpool(claim, skip_kinds)
+            except Exception as e:
+                self._slots.release()
+                logger.warning(f"job claim failed: {e}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if job is None:
+                self._slots.release()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._running_kinds[job[1]] += 1
+            task = asyncio.create_task(self._execute(*job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _execute(self, job_id, kind, payload, attempts, max_attempts):
+        try:
+            fn = HANDLERS.get(kind)
+            if fn is None:
+                raise LookupError(f"no handler for job kind {kind!r}")
+            with metrics.span(f"job.{kind}"):
+                await fn(payload)
+        except asyncio.CancelledError:
+            await run_in_threadpool(release, job_id)
+            raise
+        except Retry as e:
+            await run_in_threadpool(release, job_id, e.delay)
+            metrics.JOBS.inc(kind=kind, result="postponed")
+        except Exception as e:
+            retrying = await run_in_threadpool(fail, job_id, attempts, max_attempts, f"{type(e).__name__}: {e}")
+            metrics.JOBS.inc(kind=kind, result="retry" if retrying else "failed")
+            logger.warning(f"job {job_id} ({kind}) attempt {attempts} failed: {e}")
+        else:
+            await run_in_threadpool(finish, job_id)
+            metrics.JOBS.inc(kind=kind, result="done")
+        finally:
+            self._running_kinds[kind] -= 1
+            self._slots.release()
+            # A capped kind may be claimable again
+            self._wakeup.set()
+
+
+worker = Worker()
+
+metrics.Gauge(
+    "rulemate_jobs",
+    "Rows in the jobs table by kind and status (queue depth)",
+    depth,
+    labels=("kind", "status")
+)
@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+import threading
+
+import db
+import metrics
+from cache import LRUCache
+
+# Persistent cache of chat completions, keyed by model + messages +
+# temperature (+ any extra request options). Two tiers: a small LRU in
+# front of the llm_cache table, which every worker shares.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+LLM_CACHE_MEMORY_BYTES = int(os.getenv("LLM_CACHE_MEMORY_BYTES", str(8 * 1024 * 1024)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Expired / over-budget rows are pruned after every this many writes
+LLM_CACHE_PRUNE_EVERY = int(os.getenv("LLM_CACHE_PRUNE_EVERY", "500"))
+
+DAY = 24 * 3600
+
+# Seconds to keep a response, by call purpose (0 = never cached).
+# Override one with e.g. LLM_CACHE_TTL_CATEGORY=86400.
+DEFAULT_TTLS = {
+    "legal_check": 30 * DAY,   # temperature 0 YES/NO
+    "category": 30 * DAY,      # temperature 0, fixed category list
+    "related": 7 * DAY,
+    "structured": 7 * DAY,
+    "answer": 0,               # the stored page already is the cache
+    "other": 0,
+}
+
+TTLS = {
+    purpose: float(os.getenv(f"LLM_CACHE_TTL_{purpose.upper()}", str(ttl)))
+    for purpose, ttl in DEFAULT_TTLS.items()
+}
+
+logger = logging.getLogger("rulemate")
+
+
+def ttl_for(purpose: str) -> float:
+    if not LLM_CACHE_ENABLED:
+        return 0
+    return TTLS.get(purpose, 0)
+
+
+def cache_key(model, messages, temperature, **kwargs) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": float(temperature), "options": kwargs},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+memory = LRUCache(
+    LLM_CACHE_MEMORY_BYTES, 7 * DAY,
+    sizeof=lambda text: len(text.encode("utf-8")), name="llm"
+)
+
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+def get(key: str, purpose: str):
+    # Blocking (DB tier): call from a threadpool. Errors count as a miss.
+    value = memory.get(key)
+    if value is None:
+        try:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    SELECT response, EXTRACT(EPOCH FROM expires_at - NOW())
+                    FROM llm_cache
+                    WHERE cache_key=%s AND expires_at > NOW()
+                """, (key,))
+                row = cursor.fetchone()
+        except Exception as e:
+            logger.warning(f"llm cache lookup failed: {e}")
+            row = None
+        if row:
+            value = row[0]
+            memory.set(key, value, ttl=float(row[1]))
+
+    metrics.LLM_CACHE_REQUESTS.inc(purpose=purpose, result="miss" if value is None else "hit")
+    return value
+
+
+def put(key: str, purpose: str, model: str, response: str, ttl: float):
+    global _writes
+    memory.set(key, response, ttl=ttl)
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO llm_cache (cache_key, purpose, model, response, size_bytes, expires_at)
+                VALUES (%s, %s, %s, %s, %s, NOW() + make_interval(secs => %s))
+                ON CONFLICT (cache_key) DO UPDATE
+                SET response = EXCLUDED.response,
+                    size_bytes = EXCLUDED.size_bytes,
+                    created_at = NOW(),
+                    expires_at = EXCLUDED.expires_at
+            """, (key, purpose, model, response, len(response.encode("utf-8")), ttl))
+    except Exception as e:
+        logger.warning(f"llm cache write failed: {e}")
+        return
+
+    with _writes_lock:
+        _writes += 1
+        due = _writes % LLM_CACHE_PRUNE_EVERY == 0
+    if due:
+        try:
+            prune()
+        except Exception as e:
+            logger.warning(f"llm cache prune failed: {e}")
+
+
+def prune(max_bytes: int = LLM_CACHE_MAX_BYTES):
+    # Drop expired rows, then the oldest ones until the table fits max_bytes.
+    # Returns the number of rows deleted.
+    with db.cursor() as cursor:
+        cursor.execute("DELETE FROM llm_cache WHERE expires_at <= NOW()")
+        deleted = cursor.rowcount
+        cursor.execute("""
+            DELETE FROM llm_cache WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key,
+                           SUM(size_bytes) OVER (ORDER BY created_at DESC, cache_key) AS running
+                    FROM llm_cache
+                ) newest_first
+                WHERE running > %s
+            )
+        """, (max_bytes,))
+        return deleted + cursor.rowcount
+
+
+def stats():
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT purpose, COUNT(*), COALESCE(SUM(size_bytes), 0),
+                   COUNT(*) FILTER (WHERE expires_at <= NOW())
+            FROM llm_cache
+            GROUP BY purpose
+            ORDER BY purpose
+        """)
+        return cursor.fetchall()
+
+
+def clear(purpose: str = None):
+    memory.clear()
+    with db.cursor() as cursor:
+        if purpose:
+            cursor.execute("DELETE FROM llm_cache WHERE purpose=%s", (purpose,))
+        else:
+            cursor.execute("DELETE FROM llm_cache")
+        return cursor.rowcount
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "stats":
+        for purpose, rows, size, expired in stats():
+            print(f"{purpose:<12} {rows:>8} rows {size:>12,} B  ({expired} expired)")
+    elif command == "prune":
+        print(f"Deleted {prune()} row(s)")
+    elif command == "clear":
+        print(f"Deleted {clear(sys.argv[2] if len(sys.argv) > 2 else None)} row(s)")
+    else:
+        sys.exit("usage: python llm_cache.py [stats | prune | clear [purpose]]")
@@ -0,0 +1,172 @@
+"""Stand-in for the OpenAI chat completions API, for load tests.
+
+    python loadtest/fake_openai.py --port 8900 --latency 0.8 --tokens 200 --tps 80
+
+It answers POST /v1/chat/completions, both plain and stream=True, with
+canned output shaped like each RuleMate prompt: the YES/NO legality check,
+the category, the related questions, structured JSON, or a SHORT ANSWER /
+DETAILS answer. --latency is the time to the first token and --tps is
+the token rate when streaming. GET /stats returns call counts by prompt
+kind and POST /reset clears them.
+"""
+import time
+import json
+import uuid
+import asyncio
+import argparse
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+
+config = {"latency": 0.8, "tokens": 200, "tps": 80.0}
+calls = Counter()
+tokens_out = Counter()
+
+ANSWER_WORDS = (
+    "under the Motor Vehicles Act the penalty applies to every rider and the "
+    "traffic police may issue a challan which can be paid online or in court "
+).split()
+
+
+def classify(body):
+    if body.get("response_format"):
+        return "structured"
+    system = next((m["content"] for m in body.get("messages", []) if m["role"] == "system"), "")
+    if system.startswith("Answer ONLY YES or NO"):
+        return "legal_check"
+    if "Classify the user's question" in system:
+        return "category"
+    if "related questions" in system:
+        return "related"
+    return "answer"
+
+
+def answer_text(n_tokens):
+    words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(max(n_tokens - 12, 1))]
+    return (
+        "SHORT ANSWER:\nThe fine is Rs 1,000 for the first offence.\n"
+        "DETAILS:\n- " + " ".join(words) + "\n"
+        "SOURCE:\n- Motor Vehicles Act, 1988"
+    )
+
+
+def content_for(kind):
+    if kind == "legal_check":
+        return "YES"
+    if kind == "category":
+        return "traffic-rules-india"
+    if kind == "related":
+        return (
+            "1. What is the fine for a second offence?\n"
+            "2. Can the police seize my vehicle?\n"
+            "3. How do I pay a traffic challan online?\n"
+            "4. Is the fine different for commercial vehicles?"
+        )
+    if kind == "structured":
+        return json.dumps({
+            "answer": answer_text(config["tokens"]),
+            "related": [
+                "What is the fine for a second offence?",
+                "Can the police seize my vehicle?",
+                "How do I pay a traffic challan online?",
+                "Is the fine different for commercial vehicles?"
+            ],
+            "category": "traffic-rules-india"
+        })
+    return answer_text(config["tokens"])
+
+
+def usage(prompt_tokens, content):
+    completion = len(content.split())
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion,
+        "total_tokens": prompt_tokens + completion
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    kind = classify(body)
+    calls[kind] += 1
+
+    content = content_for(kind)
+    prompt_tokens = sum(len(m["content"].split()) for m in body.get("messages", []))
+    tokens_out[kind] += len(content.split())
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "gpt-4o-mini")
+
+    await asyncio.sleep(config["latency"])
+
+    if not body.get("stream"):
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage(prompt_tokens, content)
+        })
+
+    async def chunks():
+        delay = 1.0 / config["tps"] if config["tps"] > 0 else 0
+        for i, word in enumerate(content.split(" ")):
+            piece = word if i == 0 else " " + word
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            if delay:
+                await asyncio.sleep(delay)
+
+        done = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        }
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+def stats():
+    return {"calls": dict(calls), "completion_tokens": dict(tokens_out), "config": config}
+
+
+@app.post("/reset")
+def reset():
+    calls.clear()
+    tokens_out.clear()
+    return {"ok": True}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.8, help="seconds before the first token")
+    parser.add_argument("--tokens", type=int, default=200, help="approximate answer length in tokens")
+    parser.add_argument("--tps", type=float, default=80.0, help="streamed tokens per second")
+    args = parser.parse_args()
+
+    config.update(latency=args.latency, tokens=args.tokens, tps=args.tps)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,351 @@
+"""End-to-end load test: the real app, a local Postgres and a fake LLM.
+
+    python loadtest/run.py --database-url postgresql://postgres@127.0.0.1:5432/rulemate_load
+    python loadtest/run.py --initdb          # throwaway cluster via initdb/pg_ctl on PATH
+
+The app is served in-process by uvicorn on a local port, so its pool and
+per-request counters can be read directly. LLM calls go to
+loadtest/fake_openai.py, which runs as a subprocess with the configured
+latency and token output. --clients concurrent clients replay a
+weighted mix of:
+
+    ask_hit     POST /ask for a seeded question (stored page)
+    ask_miss    POST /ask for a new question (full generation)
+    page        GET /{slug}
+    category    GET /category/{category}
+    sitemap     GET /sitemap.xml and a child sitemap
+
+The report shows p50/p95/p99 latency, throughput, errors, and pool
+checkouts, new DB connections and LLM calls per request for each
+endpoint. It also shows the peak pool size and LLM calls by prompt
+kind. Use a scratch database: seeded and generated pages are left in
+`pages`.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import string
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter, defaultdict
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+DEFAULT_PROFILE = "ask_hit=15,ask_miss=5,page=55,category=15,sitemap=10"
+CATEGORIES = [
+    "traffic-rules-india", "passport-rules", "income-tax-rules",
+    "police-procedure", "identity-documents", "constitution-law", "general-laws"
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_profile(text):
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def random_word(rng, n=8):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(n))
+
+
+class LocalPostgres:
+    # Throwaway cluster in a temp dir, trust auth, unix socket + TCP port
+    def __init__(self):
+        self.dir = tempfile.mkdtemp(prefix="rulemate-pg-")
+        self.port = free_port()
+
+    def start(self):
+        for tool in ("initdb", "pg_ctl"):
+            if not shutil.which(tool):
+                raise SystemExit(f"--initdb needs {tool} on PATH")
+        data = os.path.join(self.dir, "data")
+        subprocess.run(
+            ["initdb", "-D", data, "-U", "postgres", "--auth=trust"],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        subprocess.run(
+            ["pg_ctl", "-D", data, "-w", "-l", os.path.join(self.dir, "log"),
+             "-o", f"-p {self.port} -k {self.dir} -c max_connections=200", "start"],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        return f"postgresql://postgres@127.0.0.1:{self.port}/postgres"
+
+    def stop(self):
+        subprocess.run(
+            ["pg_ctl", "-D", os.path.join(self.dir, "data"), "-m", "fast", "stop"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class UsageMiddleware:
+    # ASGI wrapper: one usage Counter per request, folded into per-label
+    # totals when the response (including streamed bodies) is done
+    def __init__(self, app, totals):
+        self.app = app
+        self.totals = totals
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        import usage
+
+        label = dict(scope["headers"]).get(b"x-loadtest-label", b"other").decode()
+        counter = Counter()
+        token = usage.current.set(counter)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            usage.current.reset(token)
+            self.totals[label].update(counter)
+
+
+def start_fake_llm(args, port):
+    proc = subprocess.Popen([
+        sys.executable, os.path.join(HERE, "fake_openai.py"),
+        "--port", str(port),
+        "--latency", str(args.llm_latency),
+        "--tokens", str(args.llm_tokens),
+        "--tps", str(args.llm_tps),
+    ])
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit("fake OpenAI server did not start")
+
+
+def start_app(app, port):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise SystemExit("app did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def seed(main, n, rng):
+    # Stored pages for the cache-hit and page/category endpoints
+    pages = []
+    for i in range(n):
+        question = f"What is the loadtest rule {i} about {random_word(rng)} {random_word(rng)} permits?"
+        slug = main.slugify(question)
+        pages.append((
+            slug, question,
+            "SHORT ANSWER:\nSeeded answer.\nDETAILS:\n- Seeded detail.\nSOURCE:\n- Loadtest Act",
+            [f"Seeded related question {i} number {k}?" for k in range(4)],
+            CATEGORIES[i % len(CATEGORIES)]
+        ))
+    for i in range(0, len(pages), 500):
+        main.insert_pages(pages[i:i + 500])
+    return [(p[0], p[1]) for p in pages]
+
+
+async def client_loop(http, base, profile, seeded, rng, stop_at, results):
+    names = list(profile)
+    weights = [profile[n] for n in names]
+
+    while time.monotonic() < stop_at:
+        label = rng.choices(names, weights)[0]
+        headers = {"x-loadtest-label": label}
+
+        if label == "ask_hit":
+            request = http.build_request("POST", f"{base}/ask", json={"question": rng.choice(seeded)[1]}, headers=headers)
+        elif label == "ask_miss":
+            question = f"What is the {random_word(rng)} rule for {random_word(rng)} {random_word(rng)} licence holders?"
+            request = http.build_request("POST", f"{base}/ask", json={"question": question}, headers=headers)
+        elif label == "page":
+            request = http.build_request("GET", f"{base}/{rng.choice(seeded)[0]}", headers=headers)
+        elif label == "category":
+            request = http.build_request("GET", f"{base}/category/{rng.choice(CATEGORIES)}", headers=headers)
+        else:
+            path = rng.choice(["/sitemap.xml", "/sitemap-main.xml", "/sitemap-pages-0.xml"])
+            request = http.build_request("GET", f"{base}{path}", headers=headers)
+
+        start = time.perf_counter()
+        try:
+            response = await http.send(request)
+            await response.aread()
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        results[label].append((time.perf_counter() - start, ok))
+
+
+async def sample_pool(pool, stop_at, peak):
+    while time.monotonic() < stop_at:
+        stats = pool.stats()
+        peak["size"] = max(peak["size"], stats["size"])
+        peak["in_use"] = max(peak["in_use"], stats["in_use"])
+        await asyncio.sleep(0.1)
+
+
+async def drive(args, base, seeded, pool):
+    profile = parse_profile(args.profile)
+    results = defaultdict(list)
+    peak = {"size": 0, "in_use": 0}
+    stop_at = time.monotonic() + args.duration
+
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as http:
+        await asyncio.gather(
+            sample_pool(pool, stop_at, peak),
+            *(
+                client_loop(http, base, profile, seeded, random.Random(args.seed + i), stop_at, results)
+                for i in range(args.clients)
+            )
+        )
+    return results, peak
+
+
+def report(results, totals, peak, llm_stats, duration, as_json):
+    rows = {}
+    for label in sorted(results):
+        samples = results[label]
+        latencies = sorted(t for t, _ in samples)
+        n = len(samples)
+        usage = totals.get(label, Counter())
+        rows[label] = {
+            "requests": n,
+            "errors": sum(1 for _, ok in samples if not ok),
+            "rps": n / duration,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "db_checkouts_per_req": usage["db_checkouts"] / n if n else 0,
+            "db_connects_per_req": usage["db_connects"] / n if n else 0,
+            "llm_calls_per_req": usage["llm_calls"] / n if n else 0,
+        }
+
+    summary = {
+        "endpoints": rows,
+        "total_rps": sum(r["requests"] for r in rows.values()) / duration,
+        "pool_peak_size": peak["size"],
+        "pool_peak_in_use": peak["in_use"],
+        "llm_calls_by_kind": llm_stats.get("calls", {}),
+    }
+
+    if as_json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"\n{'endpoint':<10} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'db chk/r':>9} {'db new/r':>9} {'llm/r':>7}")
+    for label, r in rows.items():
+        print(f"{label:<10} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+              f"{r['db_checkouts_per_req']:>9.2f} {r['db_connects_per_req']:>9.3f} {r['llm_calls_per_req']:>7.2f}")
+    print(f"\ntotal {summary['total_rps']:.1f} req/s, pool peak size {peak['size']} "
+          f"(peak in use {peak['in_use']})")
+    print(f"LLM calls by prompt: {summary['llm_calls_by_kind']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="RuleMate end-to-end load test")
+    db_group = parser.add_mutually_exclusive_group()
+    db_group.add_argument("--database-url", default=os.getenv("LOADTEST_DATABASE_URL"),
+                          help="scratch Postgres to run against (no TLS)")
+    db_group.add_argument("--initdb", action="store_true", help="start a throwaway local cluster")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of traffic")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="label=weight,... traffic mix")
+    parser.add_argument("--seed-pages", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="fake LLM seconds to first token")
+    parser.add_argument("--llm-tokens", type=int, default=200, help="fake LLM answer length")
+    parser.add_argument("--llm-tps", type=float, default=80.0, help="fake LLM streamed tokens/sec")
+    parser.add_argument("--pool-size", type=int, default=None, help="override DB_POOL_MAX_SIZE")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    if not args.database_url and not args.initdb:
+        parser.error("give --database-url (or LOADTEST_DATABASE_URL) or --initdb")
+    return args
+
+
+def run(args):
+    local_pg = None
+    llm = None
+    server = None
+    try:
+        if args.initdb:
+            local_pg = LocalPostgres()
+            args.database_url = local_pg.start()
+
+        llm_port = free_port()
+        llm = start_fake_llm(args, llm_port)
+
+        # Must be set before the app modules are imported
+        os.environ["DATABASE_URL"] = args.database_url
+        os.environ["DATABASE_SSLMODE"] = "disable"
+        os.environ["OPENAI_API_KEY"] = "loadtest"
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{llm_port}/v1"
+        if args.pool_size:
+            os.environ["DB_POOL_MAX_SIZE"] = str(args.pool_size)
+
+        import db
+        import main
+
+        totals = defaultdict(Counter)
+        app_port = free_port()
+        server, thread = start_app(UsageMiddleware(main.app, totals), app_port)
+
+        rng = random.Random(args.seed)
+        print(f"seeding {args.seed_pages} pages...", flush=True)
+        seeded = seed(main, args.seed_pages, rng)
+        httpx.post(f"http://127.0.0.1:{llm_port}/reset")
+        totals.clear()
+
+        print(f"running {args.clients} clients for {args.duration:.0f}s...", flush=True)
+        results, peak = asyncio.run(drive(args, f"http://127.0.0.1:{app_port}", seeded, db.pool))
+
+        llm_stats = httpx.get(f"http://127.0.0.1:{llm_port}/stats").json()
+        report(results, totals, peak, llm_stats, args.duration, args.json)
+    finally:
+        if server:
+            server.should_exit = True
+        if llm:
+            llm.terminate()
+            llm.wait()
+        if local_pg:
+            local_pg.stop()
+
+
+if __name__ == "__main__":
+    run(parse_args())
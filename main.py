@@ -1,21 +1,32 @@
 import os
 import re
+import time
+import asyncio
+import logging
+import mimetypes
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, Response, StreamingResponse, FileResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 import json
 from fastapi import Request
 from fastapi.responses import RedirectResponse
+from starlette.background import BackgroundTask
 
 # 1. Configuration & Setup
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 app = FastAPI()
+logger = logging.getLogger("rulemate")
 
 @app.middleware("http")
 async def force_domain(request: Request, call_next):
+    # Scrapers hit /metrics on whatever host they were given
+    if request.url.path == "/metrics":
+        return await call_next(request)
+
     host = request.headers.get("host")
 
     if host == "rulemate-india.onrender.com":
@@ -27,31 +38,114 @@ async def force_domain(request: Request, call_next):
 
     return await call_next(request)
 
-import psycopg2
+import psycopg2.extras
+from collections import Counter
+
+import db
+import usage
+import metrics
+import migrations
+import sitemaps
+import similarity
+import llm_cache
+import jobs
+import prefetch
+import aliases
+import http_cache
+import assets
+from similarity import similar_questions
+from slugfilter import known_slugs, is_probe
+from aliases import slug_aliases
+from cache import page_cache, verdict_cache, static_cache
+from templates import Template, escape_html, js_literal
+from pagination import (
+    CATEGORY_PAGE_SIZE, InvalidCursor, encode_cursor, decode_cursor, category_url
+)
+from singleflight import SingleFlight, advisory_lock
+
+
+@app.on_event("startup")
+def warm_pool():
+    # Open DB_POOL_MIN_SIZE connections before the first request needs one
+    db.pool.warm()
+
+@app.on_event("startup")
+def run_migrations():
+    # Versioned schema changes (see migrations.py) instead of ad-hoc DDL
+    migrations.migrate()
+
+def on_page_inserted(payload):
+    page = json.loads(payload)
+    known_slugs.add(page["slug"])
+    similar_questions.add(page["slug"], page["question"])
+    sitemaps.invalidate()
+
+def on_page_updated(payload):
+    page = json.loads(payload)
+    page_cache.invalidate(f"page:{page['slug']}")
+    if page.get("category"):
+        page_cache.invalidate_prefix(f"category:{page['category']}:")
+    sitemaps.invalidate()
+
+def on_alias_saved(payload):
+    alias = json.loads(payload)
+    slug_aliases.add(alias["alias"], alias["slug"])
+
+def on_listener_connect():
+    # Notifications may have been missed while disconnected: rebuild the
+    # slug filter and alias map, add questions inserted meanwhile, drop
+    # rendered pages that may predate an update
+    with db.connection() as conn:
+        known_slugs.load(conn)
+        with conn.cursor() as cursor:
+            slug_aliases.load(cursor)
+        with conn.cursor(name="similarity_load") as cursor:
+            similarity.load(similar_questions, cursor)
+    page_cache.clear()
+    sitemaps.invalidate()
+
+# Inserts / updates from every worker arrive over NOTIFY
+page_listener = db.Listener(
+    {
+        "pages_inserted": on_page_inserted,
+        "pages_updated": on_page_updated,
+        "slug_aliases": on_alias_saved,
+    },
+    on_connect=on_listener_connect,
+    on_disconnect=known_slugs.mark_stale,
+)
+
+@app.on_event("startup")
+def write_static_assets():
+    # For anything serving static/ straight from disk (CDN origin, nginx);
+    # /static serves them from memory either way
+    assets.write_all()
+
+@app.on_event("startup")
+def start_page_listener():
+    page_listener.start()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+@app.on_event("startup")
+async def start_jobs():
+    jobs.worker.start()
 
-def get_conn():
-    return psycopg2.connect(DATABASE_URL, sslmode="require")
+@app.on_event("shutdown")
+async def stop_jobs():
+    # Jobs cut off here go back to the queue
+    await jobs.worker.stop()
 
-def get_cursor():
-    conn = get_conn()
-    return conn, conn.cursor()
 
+@app.on_event("shutdown")
+def close_pool():
+    page_listener.stop()
+    db.pool.close()
 
-# Create table safely
-conn, cursor = get_cursor()
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS pages (
-    slug TEXT PRIMARY KEY,
-    question TEXT,
-    answer TEXT,
-    related TEXT,
-    category TEXT
+metrics.Gauge(
+    "rulemate_db_pool_connections",
+    "Pooled Postgres connections by state",
+    lambda: {(state,): db.pool.stats()[state] for state in ("in_use", "idle")},
+    labels=("state",)
 )
-""")
-conn.commit()
-conn.close()
 
 SYSTEM_PROMPT = """
 You are an Indian Government Rules Assistant.
@@ -72,60 +166,11 @@ SOURCE:
 - Name of Act / Department
 """
 
-class Question(BaseModel):
-    question: str
-
-def is_legal_question(question: str) -> bool:
-    legal_keywords = [
-        "fine", "penalty", "punishment", "law", "rule", "rules",
-        "ipc", "section", "court", "judge", "constitution",
-        "legal", "rights", "act", "government", "license",
-        "permit", "procedure", "certificate", "apply",
-        "tax", "gst", "traffic", "driving", "offence",
-        "crime", "arrest", "bail","helmet", "road safety", "motor vehicle"
-
-        # 🔥 ADD THESE IMPORTANT WORDS
-        "passport", "aadhaar", "pan", "voter", "ration",
-        "fir", "police", "complaint", "income", "return",
-        "document", "documents", "update", "renewal",
-        "registration", "apply for", "online", "process"
-    ]
-
+RELATED_PROMPT = "Generate EXACTLY 4 short related questions about Indian laws. Return them one per line."
 
-    q = question.lower()
+LEGAL_CHECK_PROMPT = "Answer ONLY YES or NO. Is this question about Indian government rules, laws, constitution, legal system, or official procedures?"
 
-    # Step 1: keyword check
-    for word in legal_keywords:
-        if word in q:
-            return True
-
-    # Step 2: fallback only if meaningful length
-    if len(q) < 20:
-        return False
-    # Step 2: fallback to AI check
-    check = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": "Answer ONLY YES or NO. Is this question about Indian government rules, laws, constitution, legal system, or official procedures?"
-            },
-            {"role": "user", "content": question}
-        ],
-        temperature=0
-    )
-
-    decision = check.choices[0].message.content.strip().upper()
-    return "YES" in decision
-
-def detect_category(question: str) -> str:
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0,
-        messages=[
-            {
-                "role": "system",
-                "content": """
+CATEGORY_PROMPT = """
 Classify the user's question into ONE of these categories ONLY:
 
 traffic-rules-india
@@ -139,28 +184,282 @@ general-laws
 Return ONLY the category name.
 No explanation.
 """
-            },
-            {"role": "user", "content": question}
-        ]
-    )
 
-    category = response.choices[0].message.content.strip().lower()
+ALLOWED_CATEGORIES = [
+    "traffic-rules-india",
+    "passport-rules",
+    "income-tax-rules",
+    "police-procedure",
+    "identity-documents",
+    "constitution-law",
+    "general-laws"
+]
+
+# Optional: answer + related + category from ONE JSON-mode call
+LLM_SINGLE_CALL = os.getenv("LLM_SINGLE_CALL", "").lower() in ("1", "true", "yes")
+
+STRUCTURED_PROMPT = SYSTEM_PROMPT + """
+Reply with a JSON object with exactly these keys:
+"answer": the full answer in the FORMAT above, as one string
+"related": EXACTLY 4 short related questions about Indian laws
+"category": the ONE category that fits the question best
+"""
 
-    allowed = [
-        "traffic-rules-india",
-        "passport-rules",
-        "income-tax-rules",
-        "police-procedure",
-        "identity-documents",
-        "constitution-law",
-        "general-laws"
-    ]
+STRUCTURED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answer": {"type": "string"},
+        "related": {"type": "array", "items": {"type": "string"}},
+        "category": {"type": "string", "enum": ALLOWED_CATEGORIES}
+    },
+    "required": ["answer", "related", "category"],
+    "additionalProperties": False
+}
+
+class Question(BaseModel):
+    question: str
+
+async def chat_completion(messages, temperature, model="gpt-4o-mini", purpose="other", **kwargs) -> str:
+    # Identical requests are served from llm_cache for the purpose's TTL
+    ttl = llm_cache.ttl_for(purpose)
+    if ttl > 0:
+        key = llm_cache.cache_key(model, messages, temperature, **kwargs)
+        cached = await run_in_threadpool(llm_cache.get, key, purpose)
+        if cached is not None:
+            return cached
+
+    usage.count("llm_calls")
+    start = time.perf_counter()
+    try:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            **kwargs
+        )
+    except Exception:
+        metrics.LLM_REQUESTS.inc(purpose=purpose, model=model, status="error")
+        raise
+    finally:
+        metrics.LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, purpose=purpose, model=model)
+
+    metrics.LLM_REQUESTS.inc(purpose=purpose, model=model, status="ok")
+    metrics.record_llm_usage(purpose, model, response.usage)
+    if response.usage:
+        usage.count("llm_tokens", response.usage.total_tokens or 0)
+    content = response.choices[0].message.content
+
+    if ttl > 0 and content and response.choices[0].finish_reason == "stop":
+        await run_in_threadpool(llm_cache.put, key, purpose, model, content, ttl)
+    return content
+
+LEGAL_KEYWORDS = [
+    "fine", "penalty", "punishment", "law", "rule", "rules",
+    "ipc", "section", "court", "judge", "constitution",
+    "legal", "rights", "act", "government", "license",
+    "permit", "procedure", "certificate", "apply",
+    "tax", "gst", "traffic", "driving", "offence",
+    "crime", "arrest", "bail", "helmet", "road safety", "motor vehicle",
+
+    # 🔥 ADD THESE IMPORTANT WORDS
+    "passport", "aadhaar", "pan", "voter", "ration",
+    "fir", "police", "complaint", "income", "return",
+    "document", "documents", "update", "renewal",
+    "registration", "apply for", "online", "process"
+]
+
+# Forms the suffixes below don't produce
+LEGAL_KEYWORD_FORMS = [
+    "illegal", "penalties", "applied", "unconstitutional", "licence", "licences"
+]
+
+# One pass over the question instead of a substring scan per keyword.
+# Whole words plus common endings ("fined", "arrested", "taxation",
+# "legally"), so "act" no longer matches "contract".
+LEGAL_KEYWORD_RE = re.compile(
+    r"\b(?:"
+    + "|".join(re.escape(k) for k in sorted(set(LEGAL_KEYWORDS + LEGAL_KEYWORD_FORMS), key=len, reverse=True))
+    + r")(?:s|es|d|ed|ing|ation|ly)?\b"
+)
+
+def has_legal_keyword(question: str) -> bool:
+    return LEGAL_KEYWORD_RE.search(question.lower()) is not None
+
+def verdict_key(question: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]", " ", question.lower())).strip()
+
+def find_verdict(key: str):
+    with metrics.span("db.find_verdict"), db.cursor() as cursor:
+        cursor.execute("SELECT verdict FROM legal_verdicts WHERE question_key=%s", (key,))
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+def save_verdict(key: str, verdict: bool):
+    with metrics.span("db.save_verdict"), db.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO legal_verdicts (question_key, verdict)
+            VALUES (%s, %s)
+            ON CONFLICT (question_key) DO NOTHING
+        """, (key, verdict))
+
+async def is_legal_question(question: str) -> bool:
+    # Step 1: keyword check
+    with metrics.span("legal.keyword_filter"):
+        matched = has_legal_keyword(question)
+    if matched:
+        return True
+
+    # Step 2: fallback only if meaningful length
+    if len(question) < 20:
+        return False
 
-    if category not in allowed:
+    # Step 3: remembered verdict (in-process LRU, then Postgres)
+    key = verdict_key(question)
+    with metrics.span("legal.verdict_lookup"):
+        verdict = verdict_cache.get(key)
+        if verdict is None:
+            verdict = await run_in_threadpool(find_verdict, key)
+    if verdict is not None:
+        verdict_cache.set(key, verdict)
+        return verdict
+
+    # Step 4: fallback to AI check
+    with metrics.span("legal.classifier"):
+        decision = await chat_completion(
+            [
+                {"role": "system", "content": LEGAL_CHECK_PROMPT},
+                {"role": "user", "content": question}
+            ],
+            temperature=0,
+            purpose="legal_check"
+        )
+
+    verdict = "YES" in decision.strip().upper()
+    verdict_cache.set(key, verdict)
+    await run_in_threadpool(save_verdict, key, verdict)
+    return verdict
+
+async def detect_category(question: str) -> str:
+    with metrics.span("ask.detect_category"):
+        content = await chat_completion(
+            [
+                {"role": "system", "content": CATEGORY_PROMPT},
+                {"role": "user", "content": question}
+            ],
+            temperature=0,
+            purpose="category"
+        )
+
+    category = content.strip().lower()
+
+    if category not in ALLOWED_CATEGORIES:
         return "general-laws"
 
     return category
 
+async def chat_completion_stream(messages, temperature, model="gpt-4o-mini", purpose="other"):
+    usage.count("llm_calls")
+    start = time.perf_counter()
+    status = "error"
+    try:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            # The final chunk carries usage and no choices
+            if chunk.usage:
+                metrics.record_llm_usage(purpose, model, chunk.usage)
+                usage.count("llm_tokens", chunk.usage.total_tokens or 0)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        status = "ok"
+    finally:
+        metrics.LLM_REQUESTS.inc(purpose=purpose, model=model, status=status)
+        metrics.LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, purpose=purpose, model=model)
+
+async def generate_answer(clean_q: str, on_token=None) -> str:
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": clean_q}
+    ]
+
+    with metrics.span("ask.generate_answer"):
+        if on_token is None:
+            return await chat_completion(messages, temperature=0.2, purpose="answer")
+
+        # Streamed: hand each token out as it arrives, return the full text
+        parts = []
+        async for token in chat_completion_stream(messages, temperature=0.2, purpose="answer"):
+            parts.append(token)
+            on_token(token)
+        return "".join(parts)
+
+def parse_related(content: str) -> list:
+    related = []
+    for r in content.split("\n"):
+        r = clean_question_text(r.strip("- ").strip())
+        if r and not is_ai_fragment(r):
+            related.append(r)
+
+    return related[:4]
+
+def parse_structured_page(content: str):
+    # Validate the single-call JSON; ValueError means "use the multi-call path"
+    try:
+        data = json.loads(content)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"not JSON: {e}")
+
+    if not isinstance(data, dict):
+        raise ValueError("not a JSON object")
+
+    answer = data.get("answer")
+    if not isinstance(answer, str) or not answer.strip():
+        raise ValueError("missing answer")
+
+    raw_related = data.get("related")
+    if not isinstance(raw_related, list) or len(raw_related) != 4 or not all(isinstance(r, str) for r in raw_related):
+        raise ValueError("related must be 4 strings")
+
+    category = data.get("category")
+    if category not in ALLOWED_CATEGORIES:
+        raise ValueError(f"unknown category: {category!r}")
+
+    related = parse_related("\n".join(raw_related))
+    return answer, related, category
+
+async def generate_structured(clean_q: str):
+    with metrics.span("ask.generate_structured"):
+        content = await chat_completion(
+            [
+                {"role": "system", "content": STRUCTURED_PROMPT},
+                {"role": "user", "content": clean_q}
+            ],
+            temperature=0.2,
+            purpose="structured",
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "rule_page", "strict": True, "schema": STRUCTURED_SCHEMA}
+            }
+        )
+    return parse_structured_page(content)
+
+async def generate_related(clean_q: str) -> list:
+    with metrics.span("ask.generate_related"):
+        content = await chat_completion(
+            [
+                {"role": "system", "content": RELATED_PROMPT},
+                {"role": "user", "content": f"Provide 4 follow-up questions for: {clean_q}"}
+            ],
+            temperature=0.5,
+            purpose="related"
+        )
+    return parse_related(content)
+
 def clean_question_text(text: str) -> str:
     # Remove numbering like "1.", "2)", "3 -"
     text = re.sub(r'^\s*\d+[\.\)\-\s]+', '', text.strip())
@@ -195,85 +494,85 @@ def slugify(text):
     return slug
 
 @app.get("/sitemap.xml", response_class=Response)
-def sitemap():
-    conn, cursor = get_cursor()
-    cursor.execute("SELECT slug FROM pages")
-    rows = cursor.fetchall()
-    conn.close()
-    
-    # 🔥 GET ALL CATEGORIES
-    conn, cursor = get_cursor()
-    cursor.execute("""
-        SELECT DISTINCT category
-        FROM pages
-        WHERE category IS NOT NULL
-    """)
-    categories = cursor.fetchall()
-    conn.close()
-    
-    base = "https://rulemate.in"
-
-    # 🚨 Block dangerous patterns
-    bad_words = [
-        ".env", "debug", "php", "aws", "config",
-        "login", "admin", "root", "sql", "backup",
-        "test", "tmp", "cache", "s3cfg"
-    ]
-
-    urls = ""
-    # 🔥 ADD CATEGORY PAGES TO SITEMAP
-    for c in categories:
-        cat = c[0]
-        urls += f"""
-        <url>
-            <loc>{base}/category/{cat}</loc>
-        </url>
-        """
-
-    # 🔥 ADD QUESTION PAGES
-    for r in rows:
-        slug = r[0].lower()
-
-        # Skip junk / dangerous slugs
-        if any(word in slug for word in bad_words):
-            continue
-
-        # Skip file-type slugs
-        if slug.endswith((".ico", ".png", ".jpg", ".jpeg", ".js", ".css", ".json")):
-            continue
+def sitemap(request: Request):
+    # Sitemap index: main sitemap + one child per SHARD_SIZE question pages
+    return http_cache.respond(request, sitemaps.index_xml(), http_cache.SITEMAP_CACHE_CONTROL)
+
+def sitemap_response(request, key, chunks):
+    entry = sitemaps.cache.get(key)
+    if entry is not None:
+        return http_cache.respond(request, entry, http_cache.SITEMAP_CACHE_CONTROL)
+
+    # First build streams without an ETag; later requests get the cached one
+    return http_cache.stream(
+        request, sitemaps.stream_and_cache(key, chunks),
+        "application/xml", http_cache.SITEMAP_CACHE_CONTROL
+    )
 
-        # Skip very short or weird slugs
-        if len(slug) < 5 or "--" in slug:
-            continue
+@app.get("/sitemap-main.xml", response_class=Response)
+def sitemap_main(request: Request):
+    return sitemap_response(request, "main", sitemaps.main_chunks())
 
-        urls += f"""
-        <url>
-            <loc>{base}/{slug}</loc>
-        </url>
-        """
+@app.get("/sitemap-pages-{shard:int}.xml", response_class=Response)
+def sitemap_pages(shard: int, request: Request):
+    bounds = sitemaps.shard_bounds()
+    if shard < 0 or shard >= len(bounds):
+        return Response("Not found", status_code=404, media_type="text/plain")
 
-    xml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    upper = bounds[shard + 1] if shard + 1 < len(bounds) else None
+    return sitemap_response(
+        request, f"pages-{shard}", sitemaps.page_chunks(bounds[shard], upper)
+    )
 
-<url>
-<loc>{base}/</loc>
-</url>
+ROBOTS_TXT = http_cache.CachedBody(b"""User-agent: *
+Allow: /
 
-{urls}
+Sitemap: https://rulemate.in/sitemap.xml""", "text/plain; charset=utf-8")
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# Bigger files are streamed from disk instead of held in static_cache
+STATIC_MAX_CACHED_FILE = int(os.getenv("STATIC_MAX_CACHED_FILE", str(1024 * 1024)))
+
+@app.get("/static/{path:path}")
+def static_file(path: str, request: Request):
+    # Content-hashed shell assets come from memory, whether or not the
+    # copy in static/ could be written
+    asset = assets.get(path)
+    if asset is not None:
+        return http_cache.respond(request, asset.entry, http_cache.IMMUTABLE_CACHE_CONTROL)
+
+    full = os.path.realpath(os.path.join(STATIC_DIR, path))
+    if (not full.startswith(STATIC_DIR + os.sep)
+            or any(part.startswith(".") for part in path.split("/"))
+            or not os.path.isfile(full)):
+        return Response("Not found", status_code=404, media_type="text/plain")
+
+    stat = os.stat(full)
+    media_type = mimetypes.guess_type(full)[0] or "application/octet-stream"
+    if media_type.startswith("text/"):
+        media_type += "; charset=utf-8"
+
+    if stat.st_size > STATIC_MAX_CACHED_FILE:
+        etag = http_cache.etag_for(full, stat.st_mtime_ns, stat.st_size)
+        if http_cache.is_not_modified(request, etag, stat.st_mtime):
+            return http_cache.not_modified(etag, http_cache.STATIC_CACHE_CONTROL, stat.st_mtime)
+        return FileResponse(
+            full, media_type=media_type,
+            headers=http_cache.headers_for(etag, http_cache.STATIC_CACHE_CONTROL, stat.st_mtime)
+        )
 
-</urlset>
-"""
-    return Response(content=xml.strip(), media_type="application/xml")
+    # Read and compressed once per file version
+    cache_key = f"{full}:{stat.st_mtime_ns}:{stat.st_size}"
+    entry = static_cache.get(cache_key)
+    if entry is None:
+        with open(full, "rb") as f:
+            entry = http_cache.CachedBody(f.read(), media_type, last_modified=stat.st_mtime)
+        static_cache.set(cache_key, entry)
+    return http_cache.respond(request, entry, http_cache.STATIC_CACHE_CONTROL)
 
 @app.get("/robots.txt", response_class=Response)
-def robots():
-    content = """
-User-agent: *
-Allow: /
-
-Sitemap: https://rulemate.in/sitemap.xml
-"""
-    return Response(content=content.strip(), media_type="text/plain")
+def robots(request: Request):
+    return http_cache.respond(request, ROBOTS_TXT, http_cache.ROBOTS_CACHE_CONTROL)
 
 def is_ai_fragment(text: str) -> bool:
     text = text.lower().strip()
@@ -296,121 +595,325 @@ def is_ai_fragment(text: str) -> bool:
 
     return False
 
-@app.post("/ask")
-def ask_rule(q: Question):
+def find_page_by_question(question: str):
+    with metrics.span("db.find_page_by_question"), db.cursor() as cursor:
+        cursor.execute(
+            "SELECT slug, answer, related FROM pages WHERE question=%s",
+            (question,)
+        )
+        return cursor.fetchone()
+
+def find_page_by_slug(slug: str):
+    with metrics.span("db.find_page_by_slug"), db.cursor() as cursor:
+        cursor.execute("SELECT answer, related FROM pages WHERE slug=%s", (slug,))
+        return cursor.fetchone()
+
+def insert_pages(pages):
+    # pages: [(slug, question, answer, related, category)]
+    # One multi-row INSERT; returns the slugs that were actually new.
+    # related / category None = fill in later through an enrich_page job.
+    if not pages:
+        return []
+
+    with metrics.span("db.insert_pages"), db.cursor() as cursor:
+        inserted = psycopg2.extras.execute_values(cursor, """
+        INSERT INTO pages (slug, question, answer, related, category,
+                           meta_summary, clean_question, related_slugs, structured_data)
+        VALUES %s
+        ON CONFLICT (slug) DO NOTHING
+        RETURNING slug
+        """, [
+            (slug, question, answer, json.dumps(related) if related is not None else None, category,
+             *page_render_fields(question, answer, related or []))
+            for slug, question, answer, related, category in pages
+        ], fetch=True)
+        inserted = {r[0] for r in inserted}
+        for slug, question, answer, related, category in pages:
+            if slug in inserted:
+                # NOTIFY payloads must stay under 8000 bytes
+                db.notify(cursor, "pages_inserted", json.dumps({"slug": slug, "question": question[:1000]}))
+
+        # Same transaction: a stored page always has its enrich job
+        for slug, question, answer, related, category in pages:
+            if slug in inserted and (related is None or category is None):
+                jobs.enqueue("enrich_page", {"slug": slug, "question": question},
+                             priority=10, dedupe_key=f"enrich:{slug}", cursor=cursor)
+
+    if not inserted:
+        return []
+
+    jobs.worker.wake()
+    sitemaps.invalidate()
+    for slug, question, answer, related, category in pages:
+        if slug not in inserted:
+            continue
+        known_slugs.add(slug)
+        similar_questions.add(slug, question)
+        page_cache.invalidate(f"page:{slug}")
+        page_cache.invalidate_prefix(f"category:{category}:")
+
+    return list(inserted)
+
+def insert_page(slug, question, answer, related, category):
+    return bool(insert_pages([(slug, question, answer, related, category)]))
+
+def find_page_extras(slug: str):
+    with db.cursor() as cursor:
+        cursor.execute("SELECT related, category FROM pages WHERE slug=%s", (slug,))
+        return cursor.fetchone()
+
+def update_page_extras(slug, related, category):
+    with metrics.span("db.update_page_extras"), db.cursor() as cursor:
+        cursor.execute("""
+            UPDATE pages SET related=%s, related_slugs=%s, category=%s, updated_at=NOW()
+            WHERE slug=%s
+        """, (json.dumps(related), related_slugs_json(related), category, slug))
+        db.notify(cursor, "pages_updated", json.dumps({"slug": slug, "category": category}))
+
+    on_page_updated(json.dumps({"slug": slug, "category": category}))
+
+def save_alias(alias: str, slug: str):
+    with db.cursor() as cursor:
+        saved = aliases.save(cursor, alias, slug)
+        if saved is None:
+            return
+        slug, redirected = saved
+        db.notify(cursor, "slug_aliases", json.dumps({"alias": alias, "slug": slug}))
+
+        # Pages linking to a redirected slug link straight to the page now:
+        # a new updated_at (so a new ETag) and every worker drops its copy
+        cursor.execute("""
+            UPDATE pages SET
+                related_slugs = (
+                    SELECT json_agg(CASE WHEN s = ANY(%(old)s) THEN %(slug)s ELSE s END ORDER BY i)::text
+                    FROM json_array_elements_text(related_slugs::json) WITH ORDINALITY AS e (s, i)
+                ),
+                updated_at = NOW()
+            WHERE related_slugs::jsonb ?| %(old)s
+            RETURNING slug, category
+        """, {"old": redirected, "slug": slug})
+        updated = [json.dumps({"slug": s, "category": c}) for s, c in cursor.fetchall()]
+        for payload in updated:
+            db.notify(cursor, "pages_updated", payload)
+
+    slug_aliases.add(alias, slug)
+    for payload in updated:
+        on_page_updated(payload)
+
+def find_existing_slugs(slugs):
+    # One round trip for a whole batch of candidate slugs
+    with db.cursor() as cursor:
+        cursor.execute("SELECT slug FROM pages WHERE slug = ANY(%s)", (list(slugs),))
+        return {r[0] for r in cursor.fetchall()}
+
+async def generate_fields(clean_q: str, on_token=None, defer_extras=False):
+    # (answer, related, category) for a new page
+    if LLM_SINGLE_CALL and on_token is None:
+        try:
+            return await generate_structured(clean_q)
+        except ValueError as e:
+            logger.warning("structured output rejected for %r: %s", clean_q, e)
+
+    if defer_extras:
+        # Only the answer now; insert_pages queues enrich_page for the rest
+        return await generate_answer(clean_q, on_token), None, None
+
+    # Answer, related and category don't depend on each other -> run together
+    return await asyncio.gather(
+        generate_answer(clean_q, on_token),
+        generate_related(clean_q),
+        detect_category(clean_q)
+    )
+
+page_flights = SingleFlight()
+
+async def generate_page(slug: str, clean_q: str, on_token=None, defer_extras=True):
+    # Serialize generation of a slug across uvicorn workers too
+    async with advisory_lock(f"page:{slug}"):
+        # Another worker may have finished it while we waited
+        existing = await run_in_threadpool(find_page_by_slug, slug)
+        if existing:
+            metrics.ASK_RESULTS.inc(result="stored_after_lock")
+            return existing[0], json.loads(existing[1]) if existing[1] else []
+
+        metrics.ASK_RESULTS.inc(result="generated")
+        answer, related, category = await generate_fields(clean_q, on_token, defer_extras)
+
+        # Store in DB
+        await run_in_threadpool(insert_page, slug, clean_q, answer, related, category)
+
+    return answer, related or []
+
+@jobs.handler("enrich_page")
+async def enrich_page(payload):
+    # Related questions + category for a page stored with only its answer
+    slug, question = payload["slug"], payload["question"]
+    row = await run_in_threadpool(find_page_extras, slug)
+    if row is None:
+        return
+    related_json, category = row
+
+    related = json.loads(related_json) if related_json is not None else None
+    if related is None and category is None:
+        related, category = await asyncio.gather(generate_related(question), detect_category(question))
+    elif related is None:
+        related = await generate_related(question)
+    elif category is None:
+        category = await detect_category(question)
+    else:
+        return
+
+    await run_in_threadpool(update_page_extras, slug, related, category)
+    await run_in_threadpool(prefetch.queue, related, [slugify(q) for q in related])
+
+@jobs.handler("prefetch_page", concurrency=prefetch.PREFETCH_CONCURRENCY)
+async def prefetch_page(payload):
+    # Speculative page for a related-question link (see prefetch.py)
+    slug, question = payload["slug"], payload["question"]
+    clean_q = clean_question_text(question)
+    if is_ai_fragment(clean_q) or junk_question_reason(clean_q, slug):
+        return
+    # dynamic_page 404s these without looking, so a page would be wasted
+    if is_probe(slug) or slug_aliases.resolve(slug) != slug:
+        return
+
+    # Same question as a stored page: link there instead
+    match = similar_questions.best_match(clean_q, similarity.ALIAS_THRESHOLD)
+    if match:
+        await run_in_threadpool(save_alias, slug, match[0])
+        return
+
+    if await run_in_threadpool(prefetch.tokens_left) <= 0:
+        raise jobs.Retry(prefetch.seconds_until_reset(), "daily prefetch token budget used up")
+
+    # Count this generation's tokens against the budget
+    spent = Counter()
+    token = usage.current.set(spent)
+    try:
+        await page_flights.do(
+            slug, lambda: generate_page(slug, clean_q, defer_extras=False)
+        )
+    finally:
+        usage.current.reset(token)
+        await run_in_threadpool(prefetch.record_tokens, spent["llm_tokens"])
+
+def junk_question_reason(clean_q: str, slug: str):
+    # Message to show instead of generating a page, or None if it's fine
+
+    # 🚨 BLOCK NON-LEGAL SINGLE WORD JUNK
+    if len(clean_q.split()) < 3:
+        return "Please ask a complete question about Indian laws or government rules."
+
+    if len(clean_q) < 15:
+        return "Please ask a detailed question about Indian laws."
+
+    # 🚨 FILTER BAD / JUNK URLS
+    bad_words = [
+        ".env", "debug", "php", "aws", "config",
+        "login", "admin", "root", "sql", "backup", "certainly", "sure"
+    ]
+
+    if any(word in slug for word in bad_words):
+        return "Invalid query."
+
+    return None
+
+async def lookup_question(question: str):
+    # Everything /ask does before it has to call the answer model.
+    # Returns (response, clean_q, slug); response is set when the request
+    # is already answered (rejected or stored), else the slug needs generating.
 
     # STEP 1: Smart legal filter
-    if not is_legal_question(q.question):
+    if not await is_legal_question(question):
+        metrics.ASK_RESULTS.inc(result="rejected")
         return {
             "answer": "This website only answers questions about Indian government rules, laws, fines, and official procedures.",
             "slug": "",
             "related": []
-        }
+        }, None, None
         
-    clean_q = clean_question_text(q.question)
+    clean_q = clean_question_text(question)
     if is_ai_fragment(clean_q):
+        metrics.ASK_RESULTS.inc(result="rejected")
         return {
             "answer": "Please ask a complete question about Indian laws.",
             "slug": "",
             "related": []
-        }
+        }, None, None
     # 🔥 NEW: Check if same question already exists
-    conn, cursor = get_cursor()
-    cursor.execute(
-        "SELECT slug, answer, related FROM pages WHERE question=%s",
-        (clean_q,)
-    )
-    existing = cursor.fetchone()
-    conn.close()
+    existing = await run_in_threadpool(find_page_by_question, clean_q)
     
     if existing:
+        metrics.ASK_RESULTS.inc(result="stored_question")
         return {
             "answer": existing[1],
             "slug": existing[0],
             "related": json.loads(existing[2]) if existing[2] else []
-        }
+        }, clean_q, existing[0]
 
     # Only generate slug if not found
     slug = slugify(clean_q)
 
-    # 🚨 BLOCK NON-LEGAL SINGLE WORD JUNK
-    if len(clean_q.split()) < 3:
-        return {
-            "answer": "Please ask a complete question about Indian laws or government rules.",
-            "slug": "",
-            "related": []
-        }
-
-    if len(clean_q) < 15:
+    rejection = junk_question_reason(clean_q, slug)
+    if rejection:
+        metrics.ASK_RESULTS.inc(result="rejected")
         return {
-            "answer": "Please ask a detailed question about Indian laws.",
+            "answer": rejection,
             "slug": "",
             "related": []
-        }
-
-    # 🚨 FILTER BAD / JUNK URLS
-    bad_words = [
-        ".env", "debug", "php", "aws", "config",
-        "login", "admin", "root", "sql", "backup", "certainly", "sure"
-    ]
+        }, None, None
 
-    if any(word in slug for word in bad_words):
-        return {
-            "answer": "Invalid query.",
-            "slug": "",
-            "related": []
-        }
+    # Known variant of another page's slug?
+    slug = slug_aliases.resolve(slug)
 
-    # Check if already exists
-    conn, cursor = get_cursor()
-    cursor.execute("SELECT answer, related FROM pages WHERE slug=%s", (slug,))
-    existing = cursor.fetchone()
-    conn.close()
+    # Check if already exists (Bloom filter miss = definitely new)
+    existing = None
+    if known_slugs.might_exist(slug):
+        existing = await run_in_threadpool(find_page_by_slug, slug)
     
     if existing:
-        answer = existing[0]
-        related = json.loads(existing[1]) if existing[1] else []
-    else:
-        # Generate answer
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": clean_q}
-            ],
-            temperature=0.2
-        )
-        answer = response.choices[0].message.content
-
-        # Generate related
-        related_response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Generate EXACTLY 4 short related questions about Indian laws. Return them one per line."},
-                {"role": "user", "content": f"Provide 4 follow-up questions for: {clean_q}"}
-            ],
-            temperature=0.5
-        )
-
-        related = []
-        for r in related_response.choices[0].message.content.split("\n"):
-            r = clean_question_text(r.strip("- ").strip())
-            if r and not is_ai_fragment(r):
-                related.append(r)
-
-        related = related[:4]
-
-        # Store in DB
-        category = detect_category(clean_q)
-        conn, cursor = get_cursor()
-        cursor.execute("""
-        INSERT INTO pages (slug, question, answer, related, category)
-        VALUES (%s, %s, %s, %s, %s)
-        ON CONFLICT (slug) DO NOTHING
-        """, (slug, clean_q, answer, json.dumps(related), category))
+        metrics.ASK_RESULTS.inc(result="stored_slug")
+        return {
+            "answer": existing[0],
+            "slug": slug,
+            "related": json.loads(existing[1]) if existing[1] else []
+        }, clean_q, slug
+
+    # 🔥 Near-duplicate of a stored question? Reuse that page, skip the LLM
+    with metrics.span("ask.similarity"):
+        match = similar_questions.best_match(clean_q)
+    if match:
+        match_slug = match[0]
+        existing = await run_in_threadpool(find_page_by_slug, match_slug)
+        if existing:
+            metrics.ASK_RESULTS.inc(result="similar")
+            # Only a rewording gets a permanent redirect; a looser match
+            # must not stop its own page from ever being generated
+            if match[1] >= similarity.ALIAS_THRESHOLD:
+                try:
+                    await run_in_threadpool(save_alias, slug, match_slug)
+                except Exception as e:
+                    logger.warning(f"saving alias {slug} failed: {e}")
+            return {
+                "answer": existing[0],
+                "slug": match_slug,
+                "related": json.loads(existing[1]) if existing[1] else []
+            }, clean_q, match_slug
+
+    return None, clean_q, slug
 
-        conn.commit()
-        conn.close()
+@app.post("/ask")
+async def ask_rule(q: Question):
+    result, clean_q, slug = await lookup_question(q.question)
+    if result:
+        return result
+
+    # One generation per slug: concurrent askers wait for the leader
+    if slug in page_flights:
+        metrics.ASK_RESULTS.inc(result="coalesced")
+    answer, related = await page_flights.do(
+        slug, lambda: generate_page(slug, clean_q)
+    )
         
     return {
         "answer": answer,
@@ -418,16 +921,67 @@ def ask_rule(q: Question):
         "related": related
     }
 
-@app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
-def home():
-    return """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>RuleMate India</title>
-    <style>
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Keep references so generations outlive a disconnected stream
+background_tasks = set()
+
+@app.post("/ask/stream")
+async def ask_rule_stream(q: Question):
+    result, clean_q, slug = await lookup_question(q.question)
+
+    async def events():
+        if result:
+            yield sse_event("token", {"t": result["answer"]})
+            yield sse_event("done", {"slug": result["slug"], "related": result["related"]})
+            return
+
+        tokens = asyncio.Queue()
+        if slug in page_flights:
+            metrics.ASK_RESULTS.inc(result="coalesced")
+
+        async def run():
+            try:
+                return await page_flights.do(
+                    slug, lambda: generate_page(slug, clean_q, on_token=tokens.put_nowait)
+                )
+            finally:
+                tokens.put_nowait(None)
+
+        # Runs as its own task: the page is still stored if the client goes away
+        task = asyncio.create_task(run())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+        streamed = False
+        while (token := await tokens.get()) is not None:
+            streamed = True
+            yield sse_event("token", {"t": token})
+
+        try:
+            answer, related = await task
+        except Exception as e:
+            # Headers are already out: report it in the stream, not as a 500
+            logger.warning(f"streamed generation for {slug} failed: {e}")
+            yield sse_event("error", {"message": "Error fetching answer."})
+            return
+
+        # Followers of another request's generation get the answer in one piece
+        if not streamed:
+            yield sse_event("token", {"t": answer})
+
+        yield sse_event("done", {"slug": slug, "related": related})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Shared stylesheet / script of the page shell, served as content-hashed
+# files under /static (see assets.py) so browsers cache them across pages.
+PAGE_CSS = """
         body {
             margin: 0; padding: 0; min-height: 100vh;
             display: flex; flex-direction: column; align-items: center;
@@ -547,153 +1101,302 @@ def home():
             border-top: 1px solid rgba(255, 255, 255, 0.08); padding-top: 25px;
             font-size: 0.75rem; color: rgba(255, 255, 255, 0.3);
         }
-    </style>
-</head>
-<body>
-    <div class="logo-container">
-        <span class="flag-emoji">🇮🇳</span>
-        <h1>RuleMate India</h1>
-    </div>
-    <p class="hero-subtitle">Government rules made easy. Just ask.</p>
-
-    <div class="glass-card">
-        <input type="text" id="userInput" placeholder="Example: What are the latest traffic rules in India?">
-        <button id="askBtn" class="btn-ask" onclick="handleAsk()">Ask</button>
-
-        <div id="resultArea">
-            <div class="answer-box" id="aiAnswer"></div>
-            <div class="related-title">Related Questions:</div>
-            <div id="relatedQuestions"></div>
-        </div>
+"""
 
-        <div style="text-align: center;">
-            <div class="check-tag">✓ Clarifying Indian regulations through an educational lens.</div>
-        </div>
-    </div>
+PAGE_JS = """
+        function renderRelated(related) {
+            const queryInput = document.getElementById('userInput');
+            const relatedBox = document.getElementById('relatedQuestions');
 
-     <div class="footer-section">
-        <div class="about-title">About RuleMate India</div>
-        <p class="about-text">RuleMate India helps people understand Indian government rules, laws, fines and procedures in simple language.</p>
-        <div class="disclaimer-container">
-            <strong>Disclaimer:</strong> This website provides general information on Indian government rules and laws for educational purposes only. It is not legal advice. Laws and rules may change. Always verify with official government notifications or consult a qualified professional. 
-        </div>
-    </div>
+            relatedBox.innerHTML = "";
+            related.forEach(q => {
+                const div = document.createElement('div');
+                div.className = 'related-q';
+                let cleanQ = q.replace(/^\\d+[\\.\\)\\s]+/, '');
+                div.innerText = cleanQ;
+                div.onclick = () => { 
+                    queryInput.value = cleanQ; 
+                    handleAsk(); 
+                    window.scrollTo({ top: 0, behavior: 'smooth' }); 
+                };
+                relatedBox.appendChild(div);
+            });
+        }
 
-    <script>
         async function handleAsk() {
             const queryInput = document.getElementById('userInput');
             const btn = document.getElementById('askBtn');
             const resultArea = document.getElementById('resultArea');
             const aiAnswer = document.getElementById('aiAnswer');
-            const relatedBox = document.getElementById('relatedQuestions');
 
             if (queryInput.value.trim() === "") return;
 
             btn.disabled = true;
             btn.innerText = "Processing...";
             aiAnswer.style.opacity = "0";
+
+            let answerText = "";
+            let started = false;
             
             setTimeout(() => {
+                if (started) return;
                 aiAnswer.innerHTML = '<div class="loading-pulse">Searching official codes...</div>';
                 aiAnswer.style.opacity = "1";
                 resultArea.style.display = "block";
             }, 400);
+
+            // Render tokens as the server streams them
+            const showToken = (t) => {
+                if (!started) {
+                    started = true;
+                    aiAnswer.innerText = "";
+                    aiAnswer.style.opacity = "1";
+                    resultArea.style.display = "block";
+                }
+                answerText += t;
+                aiAnswer.innerText = answerText;
+            };
             
             try {
-                const response = await fetch('/ask', {
+                const response = await fetch('/ask/stream', {
                     method: 'POST',
                     headers: {'Content-Type': 'application/json'},
                     body: JSON.stringify({ question: queryInput.value })
                 });
-                const data = await response.json();
-                window.history.pushState({}, "", "/" + data.slug);
-                
-                aiAnswer.style.opacity = "0";
-                
-                setTimeout(() => {
-                    aiAnswer.innerText = data.answer;
-                    aiAnswer.style.opacity = "1";
-                    relatedBox.innerHTML = "";
-                    data.related.forEach(q => {
-                        const div = document.createElement('div');
-                        div.className = 'related-q';
-                        let cleanQ = q.replace(/^\\d+[\\.\\)\\s]+/, '');
-                        div.innerText = cleanQ;
-                        div.onclick = () => { 
-                            queryInput.value = cleanQ; 
-                            handleAsk(); 
-                            window.scrollTo({ top: 0, behavior: 'smooth' }); 
-                        };
-                        relatedBox.appendChild(div);
-                    });
-                }, 400);
+                if (!response.ok) throw new Error("HTTP " + response.status);
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = "";
+
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+
+                    // Server-Sent Events: frames separated by a blank line
+                    let sep;
+                    while ((sep = buffer.indexOf("\\n\\n")) !== -1) {
+                        const frame = buffer.slice(0, sep);
+                        buffer = buffer.slice(sep + 2);
+
+                        let event = "message";
+                        let data = "";
+                        frame.split("\\n").forEach(line => {
+                            if (line.startsWith("event:")) event = line.slice(6).trim();
+                            else if (line.startsWith("data:")) data += line.slice(5).trim();
+                        });
+                        if (!data) continue;
+
+                        const payload = JSON.parse(data);
+                        if (event === "token") {
+                            showToken(payload.t);
+                        } else if (event === "done") {
+                            window.history.pushState({}, "", "/" + payload.slug);
+                            renderRelated(payload.related);
+                        } else if (event === "error") {
+                            throw new Error(payload.message);
+                        }
+                    }
+                }
             } catch (err) {
+                started = true;
                 aiAnswer.innerText = "Error fetching answer.";
                 aiAnswer.style.opacity = "1";
+                resultArea.style.display = "block";
             } finally {
                 btn.disabled = false;
                 btn.innerText = "Ask";
             }
         }
-    </script>
+"""
+
+STYLESHEET = assets.Asset("app", "css", PAGE_CSS)
+SCRIPT = assets.Asset("app", "js", PAGE_JS)
+
+# Page shell shared by home, question and category pages.
+# Parsed once; pages fill the head / answer / related / scripts slots.
+PAGE_SHELL = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <!--slot:head-->
+    <link rel="stylesheet" href="<!--slot:stylesheet_url-->">
+</head>
+<body>
+    <div class="logo-container">
+        <span class="flag-emoji">🇮🇳</span>
+        <h1>RuleMate India</h1>
+    </div>
+    <p class="hero-subtitle">Government rules made easy. Just ask.</p>
+
+    <div class="glass-card">
+        <input type="text" id="userInput" placeholder="Example: What are the latest traffic rules in India?">
+        <button id="askBtn" class="btn-ask" onclick="handleAsk()">Ask</button>
+
+        <div id="resultArea">
+            <div class="answer-box" id="aiAnswer"><!--slot:answer--></div>
+            <div class="related-title">Related Questions:</div>
+            <div id="relatedQuestions"><!--slot:related--></div>
+        </div>
+
+        <div style="text-align: center;">
+            <div class="check-tag">✓ Clarifying Indian regulations through an educational lens.</div>
+        </div>
+    </div>
+
+     <div class="footer-section">
+        <div class="about-title">About RuleMate India</div>
+        <p class="about-text">RuleMate India helps people understand Indian government rules, laws, fines and procedures in simple language.</p>
+        <div class="disclaimer-container">
+            <strong>Disclaimer:</strong> This website provides general information on Indian government rules and laws for educational purposes only. It is not legal advice. Laws and rules may change. Always verify with official government notifications or consult a qualified professional. 
+        </div>
+    </div>
+
+    <script src="<!--slot:script_url-->"></script>
+    <!--slot:scripts-->
 </body>
 </html>
 """
+
+PAGE = Template(
+    PAGE_SHELL,
+    head="<title>RuleMate India</title>",
+    stylesheet_url=STYLESHEET.url,
+    script_url=SCRIPT.url
+)
+
+HOME_HTML = PAGE.render()
+HOME_PAGE = http_cache.CachedBody(HOME_HTML.encode("utf-8"), "text/html; charset=utf-8")
+
+# Part of every question page ETag: a new shell means new HTML for the same row
+RENDER_VERSION = http_cache.etag_for(PAGE_SHELL, STYLESHEET.url, SCRIPT.url, "question-page-2")
+
+def page_etag(content_hash: str, updated_at) -> str:
+    # updated_at too: a saved alias changes a page's links, not its content
+    return http_cache.etag_for(content_hash, updated_at.timestamp(), RENDER_VERSION)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
+def home(request: Request):
+    return http_cache.respond(request, HOME_PAGE, http_cache.HOME_CACHE_CONTROL)
     
+def canonical_slug(slug: str) -> str:
+    # Every known variant of a slug -> the slug its page lives at
+    slug = slug.strip().lower()
+
+    # 🔥 NORMALIZE DASHES
+    slug = slug.replace("–", "-").replace("—", "-")
+
+    resolved = slug_aliases.resolve(slug)
+    if resolved != slug:
+        return resolved
+
+    # Numbered old slugs, unless the number is part of a stored page's
+    # slug ("16-year-old-drive-a-scooter-in-india")
+    if not known_slugs.might_exist(slug):
+        slug = unnumbered_slug(slug)
+
+    return slug_aliases.resolve(slug)
+
+def unnumbered_slug(slug: str) -> str:
+    # "12-what-is-fine" -> "what-fine" (dashes back to spaces, or slugify drops them)
+    if re.match(r'^\d+-', slug):
+        return slugify(slug.replace("-", " "))
+    return slug
+
 @app.get("/p/{slug}")
 def redirect_old_p(slug: str):
-    return RedirectResponse(url=f"/{slug}", status_code=301)
+    return RedirectResponse(url=f"/{canonical_slug(slug)}", status_code=301)
     
+def find_page_validators(slug: str):
+    # (content_hash, updated_at) from pages_slug_validators_idx alone
+    with metrics.span("page.db_validators"), db.cursor() as cursor:
+        cursor.execute("SELECT content_hash, updated_at FROM pages WHERE slug=%s", (slug,))
+        return cursor.fetchone()
+
 @app.get("/{slug}", response_class=HTMLResponse)
-def dynamic_page(slug: str):
+def dynamic_page(slug: str, request: Request):
 
-    reserved_paths = ["category", "robots.txt", "sitemap.xml", "ask"]
+    reserved_paths = ["category", "robots.txt", "sitemap.xml", "ask", "metrics"]
 
     if slug in reserved_paths:
         return HTMLResponse("Page not found", status_code=404)
     
-    slug = slug.strip().lower()
+    canonical = canonical_slug(slug)
 
-    # 🔥 NORMALIZE DASHES
-    slug = slug.replace("–", "-").replace("—", "-")
+    # 🚨 Bot probes (.env, wp-login.php, aws-config...) never reach the DB
+    if not canonical or is_probe(canonical):
+        metrics.PAGE_LOOKUPS.inc(result="probe")
+        return HTMLResponse("Page not found", status_code=404)
 
-    # Redirect numbered old slugs
-    if re.match(r'^\d+-', slug):
-        clean_slug = slugify(slug)
-        return RedirectResponse(url=f"/p/{clean_slug}", status_code=301)
+    # Variants (case, dashes, numbering, aliases): one redirect, straight there
+    if canonical != slug:
+        return RedirectResponse(url=f"/{canonical}", status_code=301)
 
-    # Basic security filter only
-    bad_words = [".env", "debug", "php", "aws", "config",
-                 "login", "admin", "root", "sql", "backup",
-                "test", "tmp", "cache"]
+    # ---- RENDERED PAGE CACHE FIRST ----
+    cache_key = f"page:{slug}"
+    entry = page_cache.get(cache_key)
+    if entry is not None:
+        return http_cache.respond(request, entry, http_cache.PAGE_CACHE_CONTROL)
 
-    if any(word in slug.split("-") for word in bad_words):
+    # ---- Bloom filter: unknown slugs 404 without a DB round trip ----
+    if not known_slugs.might_exist(slug):
+        metrics.PAGE_LOOKUPS.inc(result="unknown")
         return HTMLResponse("Page not found", status_code=404)
-    # ---- DB LOOKUP FIRST ----
-    conn, cursor = get_cursor()
-    cursor.execute("""
-        SELECT question, answer, related
-        FROM pages
-        WHERE LOWER(slug)=LOWER(%s)
-    """, (slug,))
-    page = cursor.fetchone()
-    conn.close()
+
+    # ---- Revalidation: 304 from the index, no row fetch or render ----
+    if http_cache.is_conditional(request):
+        validators = find_page_validators(slug)
+        if not validators:
+            return HTMLResponse("Page not found", status_code=404)
+        etag, last_modified = page_etag(*validators), validators[1].timestamp()
+        if http_cache.is_not_modified(request, etag, last_modified):
+            metrics.PAGE_LOOKUPS.inc(result="not_modified")
+            return http_cache.not_modified(etag, http_cache.PAGE_CACHE_CONTROL, last_modified)
+
+    # ---- THEN DB ----
+    metrics.PAGE_LOOKUPS.inc(result="db")
+    with metrics.span("page.db_lookup"), db.cursor() as cursor:
+        cursor.execute("""
+            SELECT question, answer, related,
+                   meta_summary, clean_question, related_slugs, structured_data,
+                   content_hash, updated_at
+            FROM pages
+            WHERE slug=%s
+        """, (slug,))
+        page = cursor.fetchone()
 
     if not page:
+        # An old numbered slug the slug filter couldn't rule out
+        unnumbered = slug_aliases.resolve(unnumbered_slug(slug))
+        if unnumbered != slug and known_slugs.might_exist(unnumbered):
+            return RedirectResponse(url=f"/{unnumbered}", status_code=301)
         return HTMLResponse("Page not found", status_code=404)
 
-    question, answer, related_json = page
- 
-    # 🔥 REMOVE SERIAL NUMBERS FROM OLD QUESTIONS
-    clean_question = re.sub(r'^\d+[\.\)\s]+', '', question)
-    related = json.loads(related_json) if related_json else []
-    
-    # Generate related HTML using your SAME styling (Flattened string to prevent pre-wrap issues)
-    related_html = ""
-    for q in related:
-        clean_q = q.replace('"', '').replace("'", "")
-        related_html += f'<div class="related-q"><a href="/p/{slugify(clean_q)}" style="color:inherit; text-decoration:none; display:block;">{clean_q}</a></div>'
+    with metrics.span("page.render"):
+        html = render_question_page(slug, *page[:7])
+    entry = http_cache.CachedBody(
+        html.encode("utf-8"), "text/html; charset=utf-8",
+        etag=page_etag(page[7], page[8]), last_modified=page[8].timestamp()
+    )
+    page_cache.set(cache_key, entry)
+
+    response = http_cache.respond(request, entry, http_cache.PAGE_CACHE_CONTROL)
+
+    # Make sure the related links lead to pages, after the response is sent
+    related = json.loads(page[2]) if page[2] else []
+    if related:
+        related_slugs = json.loads(page[5]) if page[5] else [slugify(q) for q in related]
+        response.background = BackgroundTask(prefetch.queue, related, related_slugs)
+
+    return response
 
+def extract_meta_summary(answer: str) -> str:
     # Extract SHORT ANSWER for meta description
     meta_summary = answer
 
@@ -707,111 +1410,207 @@ def dynamic_page(slug: str):
     meta_summary = meta_summary.replace("\n", " ").replace('"', '').strip()
 
     # Limit to 155 characters
-    meta_summary = meta_summary[:155]
-    
-    # SEO HEAD CONTENT
-    seo_head = f"""
-        <title>{clean_question.title()} | RuleMate India</title>
-        <meta name="description" content="{meta_summary}">
-        <link rel="canonical" href="https://rulemate.in/{slug}">
-    """
-
-    html = home().replace(
-        "<title>RuleMate India</title>",
-        seo_head
-    ).replace(
-        '<div class="answer-box" id="aiAnswer"></div>',
-        f'<div class="answer-box" id="aiAnswer">{answer}</div>'
-    )
+    return meta_summary[:155]
+
+def link_html(href: str, text: str) -> str:
+    # Flattened string to prevent pre-wrap issues
+    return f'<div class="related-q"><a href="{escape_html(href)}" style="color:inherit; text-decoration:none; display:block;">{escape_html(text)}</a></div>'
+
+def page_render_fields(question, answer, related):
+    # Everything render_question_page derives from a row. Never changes once
+    # the row is written, so insert_pages stores it next to the page:
+    # (meta_summary, clean_question, related_slugs JSON, structured_data)
+
+    # 🔥 REMOVE SERIAL NUMBERS FROM OLD QUESTIONS
+    clean_question = re.sub(r'^\d+[\.\)\s]+', '', question)
+    meta_summary = extract_meta_summary(answer)
 
     # Structured Data (FAQ Schema)
-    structured_data = f"""
-    <script type="application/ld+json">
-    {{
+    structured_data = js_literal({
         "@context": "https://schema.org",
         "@type": "FAQPage",
         "mainEntity": [
-            {{
+            {
                 "@type": "Question",
-                "name": "{clean_question}",
-                "acceptedAnswer": {{
+                "name": clean_question,
+                "acceptedAnswer": {
                     "@type": "Answer",
-                    "text": "{meta_summary}"
-                }}
-            }}
+                    "text": meta_summary
+                }
+            }
         ]
-    }}
-    </script>
-    """
+    })
 
-    inject = f"""
-    <script>
-    window.onload = () => {{
-        document.getElementById("resultArea").style.display = "block";
-        document.getElementById("aiAnswer").innerText = {json.dumps(answer)};
-        document.getElementById("userInput").value = `{clean_question}`;
-
-        const relatedBox = document.getElementById("relatedQuestions");
-        relatedBox.innerHTML = `{related_html}`;
-    }};
-    </script>
-    """
+    return meta_summary, clean_question, related_slugs_json(related), structured_data
 
-    return html.replace("</body>", structured_data + inject + "</body>")
+def related_slugs_json(related):
+    return json.dumps([slugify(q) for q in related])
 
+def render_question_page(slug, question, answer, related_json,
+                         meta_summary=None, clean_question=None,
+                         related_slugs=None, structured_data=None):
+    related = json.loads(related_json) if related_json else []
 
-@app.get("/category/{category}", response_class=HTMLResponse)
-def category_page(category: str):
-    conn, cursor = get_cursor()
-    cursor.execute("""
-        SELECT slug, question FROM pages
-        WHERE category=%s
-        ORDER BY question
-    """, (category,))
-
-    rows = cursor.fetchall()
-    conn.close()
+    # Rows from before the precomputed columns (or not backfilled yet)
+    if None in (meta_summary, clean_question, related_slugs, structured_data):
+        meta_summary, clean_question, related_slugs, structured_data = page_render_fields(
+            question, answer, related
+        )
+    related_slugs = json.loads(related_slugs)
     
-    if not rows:
-        return HTMLResponse("<h2>No content found for this category yet.</h2>")
-
-    links_html = ""
-
-    for slug, question in rows:
-        clean_q = re.sub(r'^\d+[\.\)\s]+', '', question)
-
-        # Flattened string to prevent pre-wrap issues
-        links_html += f'<div class="related-q"><a href="/{slug}" style="color:inherit; text-decoration:none; display:block;">{clean_q}</a></div>'
-
-    title = category.replace("-", " ").title()
-
-    seo_head = f"""
-        <title>{title} | RuleMate India</title>
-        <meta name="description" content="Complete guide about {title} rules, fines, penalties and laws in India.">
-    """
+    # Generate related HTML using your SAME styling. Probe-looking slugs
+    # ("...driving test...") always 404, so they get no link.
+    related_html = "".join(
+        link_html(f"/{rel_slug}", q.replace('"', '').replace("'", ""))
+        for q, rel_slug in zip(related, map(slug_aliases.resolve, related_slugs))
+        if not is_probe(rel_slug)
+    )
 
-    html = home().replace("<title>RuleMate India</title>", seo_head)
+    # SEO HEAD CONTENT
+    seo_head = (
+        f'<title>{escape_html(clean_question.title())} | RuleMate India</title>\n'
+        f'    <meta name="description" content="{escape_html(meta_summary)}">\n'
+        f'    <link rel="canonical" href="https://rulemate.in/{escape_html(slug)}">'
+    )
 
-    content = f"""
+    scripts = f"""<script type="application/ld+json">{structured_data}</script>
     <script>
     window.onload = () => {{
         document.getElementById("resultArea").style.display = "block";
-        document.getElementById("aiAnswer").innerHTML = `
-        <h2>{title}</h2>
-        <p>Below are all important questions related to this topic:</p>
-        {links_html}
-        `;
+        document.getElementById("userInput").value = {js_literal(clean_question)};
     }};
-    </script>
-    """
+    </script>"""
 
-    return html.replace("</body>", content + "</body>")
+    return PAGE.render(
+        head=seo_head,
+        answer=escape_html(answer),
+        related=related_html,
+        scripts=scripts
+    )
 
 
+def fetch_category_rows(category, after=None, before=None, limit=CATEGORY_PAGE_SIZE):
+    # Keyset pagination on (question, slug): one index range scan per page,
+    # no OFFSET. Returns (rows, has_prev, has_next, prev_is_first); when
+    # prev_is_first the previous page is the bare category URL.
+    with db.cursor() as cursor:
+        if before:
+            question, slug = decode_cursor(before)
+            # Two pages back tells whether the previous one is the first
+            cursor.execute("""
+                SELECT slug, question FROM pages
+                WHERE category=%s AND (question, slug) < (%s, %s)
+                ORDER BY question DESC, slug DESC
+                LIMIT %s
+            """, (category, question, slug, 2 * limit + 1))
+            rows = cursor.fetchall()
+            has_prev = len(rows) > limit
+            return rows[:limit][::-1], has_prev, True, len(rows) <= 2 * limit
+
+        if after:
+            question, slug = decode_cursor(after)
+            cursor.execute("""
+                SELECT slug, question FROM pages
+                WHERE category=%s AND (question, slug) > (%s, %s)
+                ORDER BY question, slug
+                LIMIT %s
+            """, (category, question, slug, limit + 1))
+            rows = cursor.fetchall()
+            # Rows up to the cursor, counted no further than one page
+            cursor.execute("""
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM pages
+                    WHERE category=%s AND (question, slug) <= (%s, %s)
+                    LIMIT %s
+                ) AS earlier
+            """, (category, question, slug, limit + 1))
+            prev_is_first = cursor.fetchone()[0] <= limit
+            return rows[:limit], True, len(rows) > limit, prev_is_first
 
+        cursor.execute("""
+            SELECT slug, question FROM pages
+            WHERE category=%s
+            ORDER BY question, slug
+            LIMIT %s
+        """, (category, limit + 1))
+        rows = cursor.fetchall()
+        return rows[:limit], False, len(rows) > limit, False
 
+@app.get("/category/{category}", response_class=HTMLResponse)
+def category_page(category: str, request: Request, after: str = None, before: str = None):
+    category = category.strip().lower()
+
+    cache_key = f"category:{category}:{after or ''}:{before or ''}"
+    entry = page_cache.get(cache_key)
+    if entry is not None:
+        return http_cache.respond(request, entry, http_cache.CATEGORY_CACHE_CONTROL)
+
+    try:
+        with metrics.span("category.db_lookup"):
+            rows, has_prev, has_next, prev_is_first = fetch_category_rows(category, after, before)
+    except InvalidCursor:
+        return HTMLResponse("Page not found", status_code=404)
+    
+    if not rows:
+        if after or before:
+            return HTMLResponse("Page not found", status_code=404)
+        return HTMLResponse("<h2>No content found for this category yet.</h2>")
 
+    # The first page has exactly one URL
+    if before and not has_prev:
+        return RedirectResponse(url=category_url(category), status_code=301)
+
+    prev_url = None
+    if prev_is_first:
+        prev_url = category_url(category)
+    elif has_prev:
+        prev_url = category_url(category, before=encode_cursor(rows[0][1], rows[0][0]))
+    next_url = category_url(category, after=encode_cursor(rows[-1][1], rows[-1][0])) if has_next else None
+
+    with metrics.span("category.render"):
+        html = render_category_page(category, rows, prev_url, next_url)
+    # The rows come from an index-only scan, so revalidation just compares
+    # the body hash
+    entry = http_cache.CachedBody(html.encode("utf-8"), "text/html; charset=utf-8")
+    page_cache.set(cache_key, entry)
+    return http_cache.respond(request, entry, http_cache.CATEGORY_CACHE_CONTROL)
+
+def render_category_page(category, rows, prev_url=None, next_url=None):
+    links_html = "".join(
+        link_html(f"/{slug}", re.sub(r'^\d+[\.\)\s]+', '', question))
+        for slug, question in rows
+    )
 
+    title = escape_html(category.replace("-", " ").title())
+
+    # rel=prev/next so crawlers can walk every page of the category
+    pager_head = ""
+    pager_html = ""
+    if prev_url:
+        pager_head += f'\n    <link rel="prev" href="https://rulemate.in{escape_html(prev_url)}">'
+        pager_html += f'<a rel="prev" href="{escape_html(prev_url)}" style="color:inherit; margin-right:20px;">&laquo; Previous</a>'
+    if next_url:
+        pager_head += f'\n    <link rel="next" href="https://rulemate.in{escape_html(next_url)}">'
+        pager_html += f'<a rel="next" href="{escape_html(next_url)}" style="color:inherit;">Next &raquo;</a>'
+
+    seo_head = (
+        f'<title>{title} | RuleMate India</title>\n'
+        f'    <meta name="description" content="Complete guide about {title} rules, fines, penalties and laws in India.">'
+        f'{pager_head}'
+    )
 
+    content = (
+        f'<h2>{title}</h2>'
+        f'<p>Below are all important questions related to this topic:</p>'
+        f'{links_html}'
+    )
+    if pager_html:
+        content += f'<p style="margin-top:20px;">{pager_html}</p>'
 
+    scripts = """<script>
+    window.onload = () => {
+        document.getElementById("resultArea").style.display = "block";
+    };
+    </script>"""
 
+    return PAGE.render(head=seo_head, answer=content, scripts=scripts)
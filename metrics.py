@@ -0,0 +1,212 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Minimal Prometheus client: counters, histograms and callback gauges,
+# rendered in the text exposition format for /metrics.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self):
+        return f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + "".join(
+            f"{self.name}{_labels(self.label_names, key)} {_number(value)}\n"
+            for key, value in items
+        )
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+
+        out = [self.header()]
+        for key, state in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, state):
+                cumulative += n
+                out.append(f"{self.name}_bucket{_labels(self.label_names, key, ('le', _number(float(bound))))} {cumulative}\n")
+            out.append(f"{self.name}_bucket{_labels(self.label_names, key, ('le', '+Inf'))} {state[-1]}\n")
+            out.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(state[-2])}\n")
+            out.append(f"{self.name}_count{_labels(self.label_names, key)} {state[-1]}\n")
+        return "".join(out)
+
+
+class Gauge(Metric):
+    # Read at scrape time: fn() returns a number, or {label tuple: number}
+    kind = "gauge"
+
+    def __init__(self, name, help, fn, labels=()):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return ""
+        if isinstance(value, dict):
+            items = sorted(value.items())
+        else:
+            items = [((), value)]
+        return self.header() + "".join(
+            f"{self.name}{_labels(self.label_names, key)} {_number(v)}\n"
+            for key, v in items
+        )
+
+
+def render():
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+# ---- RuleMate metrics ----
+
+STAGE_SECONDS = Histogram(
+    "rulemate_stage_seconds",
+    "Time spent in each hot-path stage",
+    labels=("stage",)
+)
+
+LLM_REQUEST_SECONDS = Histogram(
+    "rulemate_llm_request_seconds",
+    "OpenAI chat completion latency (full response, or full stream)",
+    labels=("purpose", "model")
+)
+
+LLM_REQUESTS = Counter(
+    "rulemate_llm_requests_total",
+    "OpenAI chat completion calls",
+    labels=("purpose", "model", "status")
+)
+
+LLM_TOKENS = Counter(
+    "rulemate_llm_tokens_total",
+    "OpenAI tokens used",
+    labels=("purpose", "model", "type")
+)
+
+CACHE_REQUESTS = Counter(
+    "rulemate_cache_requests_total",
+    "Lookups in the in-process caches",
+    labels=("cache", "result")
+)
+
+ASK_RESULTS = Counter(
+    "rulemate_ask_results_total",
+    "How /ask requests were answered (stored page vs new LLM generation)",
+    labels=("result",)
+)
+
+LLM_CACHE_REQUESTS = Counter(
+    "rulemate_llm_cache_requests_total",
+    "Chat completions answered from the LLM response cache (memory or llm_cache table)",
+    labels=("purpose", "result")
+)
+
+JOBS = Counter(
+    "rulemate_jobs_total",
+    "Background job runs by outcome (done, retry, failed)",
+    labels=("kind", "result")
+)
+
+PAGE_LOOKUPS = Counter(
+    "rulemate_page_lookups_total",
+    "/{slug} requests past the page cache: probe and unknown (Bloom filter miss) never hit the DB",
+    labels=("result",)
+)
+
+
+def span(stage):
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def record_llm_usage(purpose, model, usage):
+    if usage is None:
+        return
+    LLM_TOKENS.inc(usage.prompt_tokens or 0, purpose=purpose, model=model, type="prompt")
+    LLM_TOKENS.inc(usage.completion_tokens or 0, purpose=purpose, model=model, type="completion")
@@ -0,0 +1,207 @@
+import sys
+
+import db
+
+# Ordered schema changes. Never edit an applied migration: append a new one.
+# Each one runs in its own transaction together with its version row.
+MIGRATIONS = [
+    (1, "create pages table", """
+        CREATE TABLE IF NOT EXISTS pages (
+            slug TEXT PRIMARY KEY,
+            question TEXT,
+            answer TEXT,
+            related TEXT,
+            category TEXT
+        )
+    """),
+
+    (2, "normalize slugs to lowercase", """
+        -- Keep the lowercase row if there is one, else the smallest variant
+        DELETE FROM pages p
+        USING pages q
+        WHERE LOWER(p.slug) = LOWER(q.slug)
+          AND p.slug <> q.slug
+          AND (q.slug = LOWER(q.slug) OR (p.slug <> LOWER(p.slug) AND q.slug < p.slug));
+
+        UPDATE pages SET slug = LOWER(slug) WHERE slug <> LOWER(slug);
+
+        ALTER TABLE pages
+            ADD CONSTRAINT pages_slug_lowercase CHECK (slug = LOWER(slug));
+    """),
+
+    (3, "index question and category lookups", """
+        CREATE INDEX IF NOT EXISTS pages_question_idx ON pages (question);
+        CREATE INDEX IF NOT EXISTS pages_category_question_idx ON pages (category, question);
+    """),
+
+    (4, "keyset index for category pagination", """
+        -- (question, slug) is the category page cursor
+        CREATE INDEX IF NOT EXISTS pages_category_question_slug_idx
+            ON pages (category, question, slug);
+        DROP INDEX IF EXISTS pages_category_question_idx;
+    """),
+
+    (5, "legality verdict cache", """
+        CREATE TABLE IF NOT EXISTS legal_verdicts (
+            question_key TEXT PRIMARY KEY,
+            verdict BOOLEAN NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    """),
+
+    (6, "llm response cache", """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            cache_key TEXT PRIMARY KEY,
+            purpose TEXT NOT NULL,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            expires_at TIMESTAMPTZ NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS llm_cache_expires_idx ON llm_cache (expires_at);
+        CREATE INDEX IF NOT EXISTS llm_cache_created_idx ON llm_cache (created_at);
+    """),
+
+    (7, "precomputed page render fields", """
+        -- Filled on insert; older rows by backfill.py (NULL = derive at render)
+        ALTER TABLE pages
+            ADD COLUMN IF NOT EXISTS meta_summary TEXT,
+            ADD COLUMN IF NOT EXISTS clean_question TEXT,
+            ADD COLUMN IF NOT EXISTS related_slugs TEXT,
+            ADD COLUMN IF NOT EXISTS structured_data TEXT;
+    """),
+
+    (8, "background job queue", """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id BIGSERIAL PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload JSONB NOT NULL DEFAULT '{}',
+            priority INTEGER NOT NULL DEFAULT 0,
+            dedupe_key TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 5,
+            run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            locked_at TIMESTAMPTZ,
+            last_error TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        -- Claim order for queued jobs
+        CREATE INDEX IF NOT EXISTS jobs_queued_idx
+            ON jobs (priority DESC, run_after, id) WHERE status = 'queued';
+        CREATE INDEX IF NOT EXISTS jobs_running_idx
+            ON jobs (locked_at) WHERE status = 'running';
+        -- At most one pending job per dedupe key
+        CREATE UNIQUE INDEX IF NOT EXISTS jobs_dedupe_idx
+            ON jobs (dedupe_key) WHERE status IN ('queued', 'running');
+    """),
+
+    (9, "daily llm token budgets", """
+        CREATE TABLE IF NOT EXISTS llm_budget (
+            day DATE NOT NULL,
+            name TEXT NOT NULL,
+            tokens BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, name)
+        );
+    """),
+
+    (10, "slug aliases", """
+        -- Variant slug -> canonical page slug (never another alias)
+        CREATE TABLE IF NOT EXISTS slug_aliases (
+            alias TEXT PRIMARY KEY,
+            slug TEXT NOT NULL REFERENCES pages (slug) ON DELETE CASCADE,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS slug_aliases_slug_idx ON slug_aliases (slug);
+    """),
+
+    (11, "page timestamps and content hash", """
+        -- Existing rows get the migration time: their real age is unknown
+        ALTER TABLE pages
+            ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            ADD COLUMN IF NOT EXISTS content_hash TEXT GENERATED ALWAYS AS (
+                md5(COALESCE(question, '') || chr(1) || COALESCE(answer, '') || chr(1) || COALESCE(related, ''))
+            ) STORED;
+        -- Conditional GETs are answered by an index-only scan
+        CREATE INDEX IF NOT EXISTS pages_slug_validators_idx
+            ON pages (slug) INCLUDE (content_hash, updated_at);
+    """),
+
+    (12, "related slug lookup", """
+        -- Pages linking to a slug, rewritten when it becomes an alias
+        CREATE INDEX IF NOT EXISTS pages_related_slugs_idx
+            ON pages USING gin ((related_slugs::jsonb));
+    """),
+]
+
+LOCK_KEY = "schema_migrations"
+
+
+def applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {r[0] for r in cursor.fetchall()}
+
+
+def migrate(log=print):
+    # Safe to call from every worker on startup: a session advisory lock
+    # makes the others wait, then they find nothing left to apply.
+    conn = db.pool.getconn()
+    lock_id = db.advisory_lock_id(LOCK_KEY)
+    applied_now = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (lock_id,))
+            conn.commit()
+
+            try:
+                done = applied_versions(cursor)
+                conn.commit()
+
+                for version, name, sql in MIGRATIONS:
+                    if version in done:
+                        continue
+                    log(f"Applying migration {version}: {name}")
+                    cursor.execute(sql)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (version, name)
+                    )
+                    conn.commit()
+                    applied_now.append(version)
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (lock_id,))
+                conn.commit()
+    except BaseException:
+        db.pool.putconn(conn, discard=True)
+        raise
+    else:
+        db.pool.putconn(conn)
+
+    return applied_now
+
+
+def status():
+    with db.cursor() as cursor:
+        done = applied_versions(cursor)
+    return [(version, name, version in done) for version, name, _ in MIGRATIONS]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        for version, name, applied in status():
+            print(f"{version:>4}  {'applied' if applied else 'pending':<8} {name}")
+    else:
+        applied = migrate()
+        print(f"Applied {len(applied)} migration(s)")
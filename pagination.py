@@ -0,0 +1,36 @@
+import os
+import json
+import base64
+
+CATEGORY_PAGE_SIZE = int(os.getenv("CATEGORY_PAGE_SIZE", "50"))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(question: str, slug: str) -> str:
+    # Opaque keyset position: the (question, slug) of a boundary row
+    raw = json.dumps([question, slug], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        question, slug = json.loads(raw)
+    except Exception:
+        raise InvalidCursor(cursor)
+
+    if not isinstance(question, str) or not isinstance(slug, str):
+        raise InvalidCursor(cursor)
+    return question, slug
+
+
+def category_url(category: str, after=None, before=None) -> str:
+    url = f"/category/{category}"
+    if after:
+        return f"{url}?after={after}"
+    if before:
+        return f"{url}?before={before}"
+    return url
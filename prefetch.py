@@ -0,0 +1,97 @@
+import os
+import logging
+import datetime
+
+import db
+import jobs
+import metrics
+from cache import LRUCache
+from aliases import slug_aliases
+from slugfilter import known_slugs, is_probe
+
+# Speculative generation of a page's related questions, so the /p/ links
+# on every page lead somewhere. Runs as low-priority prefetch_page jobs,
+# at most PREFETCH_CONCURRENCY per worker (the job worker doesn't claim
+# more) and within a daily token budget shared by all workers (soft: jobs
+# already running when it runs out still finish).
+PREFETCH_ENABLED = os.getenv("PREFETCH", "on").lower() not in ("0", "off", "false", "no")
+PREFETCH_DAILY_TOKENS = int(os.getenv("PREFETCH_DAILY_TOKENS", "200000"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "1"))
+PREFETCH_PRIORITY = -10
+
+BUDGET_NAME = "prefetch"
+
+logger = logging.getLogger("rulemate")
+
+# Slugs queued recently by this worker: saves a jobs INSERT per view
+recently_queued = LRUCache(50000, 3600, sizeof=lambda value: 1, name="prefetch_queued")
+
+
+def today():
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def seconds_until_reset():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    midnight = datetime.datetime.combine(today() + datetime.timedelta(days=1), datetime.time(), now.tzinfo)
+    return (midnight - now).total_seconds() + 1
+
+
+def tokens_used_today():
+    with db.cursor() as cursor:
+        cursor.execute("SELECT tokens FROM llm_budget WHERE day=%s AND name=%s", (today(), BUDGET_NAME))
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def tokens_left():
+    return PREFETCH_DAILY_TOKENS - tokens_used_today()
+
+
+def record_tokens(n):
+    if n <= 0:
+        return
+    with db.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO llm_budget (day, name, tokens) VALUES (%s, %s, %s)
+            ON CONFLICT (day, name) DO UPDATE SET tokens = llm_budget.tokens + EXCLUDED.tokens
+        """, (today(), BUDGET_NAME, n))
+
+
+def queue(questions, slugs):
+    # Queue the related questions (and their link slugs) that have no page,
+    # in one INSERT. Blocking: run it off the request path. Best effort:
+    # errors are only logged. Returns how many jobs were added.
+    if not PREFETCH_ENABLED:
+        return 0
+
+    batch = {}
+    for question, slug in zip(questions, slugs):
+        slug = slug_aliases.resolve(slug)
+        if not slug or is_probe(slug) or known_slugs.might_exist(slug) or recently_queued.get(slug):
+            continue
+        batch.setdefault(slug, question)
+    if not batch:
+        return 0
+
+    try:
+        added = jobs.enqueue_many(
+            "prefetch_page",
+            [{"slug": slug, "question": question} for slug, question in batch.items()],
+            [f"prefetch:{slug}" for slug in batch],
+            priority=PREFETCH_PRIORITY
+        )
+    except Exception as e:
+        logger.warning(f"prefetch queue failed for {', '.join(batch)}: {e}")
+        return 0
+
+    for slug in batch:
+        recently_queued.set(slug, True)
+    return added
+
+
+metrics.Gauge(
+    "rulemate_prefetch_tokens_today",
+    "LLM tokens spent on prefetched pages today (UTC)",
+    tokens_used_today
+)
@@ -0,0 +1,200 @@
+"""Pre-generate pages in bulk from a question list.
+
+    python pregenerate.py questions.jsonl --field question --workers 8 --rate 4
+
+Input is JSONL (one object per line, question taken from --field) or
+plain text (one question per line). Questions go through the same
+cleaning, junk and legality filters as /ask. Slugs that already exist
+are skipped with one bulk lookup. The rest are generated by a bounded
+worker pool under a request rate limit and inserted in batches. Every
+processed slug is appended to the checkpoint file, so an interrupted run
+picks up where it stopped.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+from fastapi.concurrency import run_in_threadpool
+
+import main
+import migrations
+
+
+def read_questions(path, field):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                question = record.get(field) or record.get("question") or record.get("title")
+                if isinstance(question, str):
+                    yield question
+            else:
+                yield line
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class RateLimiter:
+    # Spaces out starts to at most `rate` per second across all workers
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Progress:
+    def __init__(self, total, every=5.0):
+        self.total = total
+        self.every = every
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.generated = 0
+        self.rejected = 0
+        self.failed = 0
+
+    @property
+    def done(self):
+        return self.generated + self.rejected + self.failed
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_report < self.every:
+            return
+        self.last_report = now
+        elapsed = max(now - self.started, 1e-9)
+        print(
+            f"[{elapsed:7.1f}s] {self.done}/{self.total} "
+            f"generated={self.generated} rejected={self.rejected} failed={self.failed} "
+            f"({self.generated / elapsed:.2f} pages/s)",
+            flush=True
+        )
+
+
+async def run(args):
+    await run_in_threadpool(migrations.migrate)
+
+    done = load_checkpoint(args.checkpoint)
+    checkpoint = open(args.checkpoint, "a", encoding="utf-8") if args.checkpoint else None
+
+    # Clean + dedupe by slug, same rules as /ask
+    candidates = {}
+    for raw in read_questions(args.input, args.field):
+        clean_q = main.clean_question_text(raw)
+        if not clean_q or main.is_ai_fragment(clean_q):
+            continue
+        slug = main.slugify(clean_q)
+        if not slug or slug in done or slug in candidates:
+            continue
+        if main.junk_question_reason(clean_q, slug):
+            continue
+        candidates[slug] = clean_q
+
+    # One bulk lookup instead of a SELECT per question
+    existing = set()
+    slugs = list(candidates)
+    for i in range(0, len(slugs), 10000):
+        existing |= await run_in_threadpool(main.find_existing_slugs, slugs[i:i + 10000])
+    for slug in existing:
+        del candidates[slug]
+
+    print(f"{len(candidates)} new questions, {len(existing)} already exist, {len(done)} in checkpoint", flush=True)
+
+    progress = Progress(len(candidates))
+    limiter = RateLimiter(args.rate)
+    queue = asyncio.Queue()
+    for item in candidates.items():
+        queue.put_nowait(item)
+
+    batch = []
+    processed = []
+    batch_lock = asyncio.Lock()
+
+    async def flush():
+        # Write the batch, then checkpoint everything it covered
+        nonlocal batch, processed
+        rows, batch = batch, []
+        slugs, processed = processed, []
+        if rows:
+            await run_in_threadpool(main.insert_pages, rows)
+        if checkpoint and slugs:
+            checkpoint.write("".join(f"{s}\n" for s in slugs))
+            checkpoint.flush()
+
+    async def worker():
+        while True:
+            try:
+                slug, clean_q = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            row = None
+            try:
+                await limiter.wait()
+                if await main.is_legal_question(clean_q):
+                    answer, related, category = await main.generate_fields(clean_q)
+                    row = (slug, clean_q, answer, related, category)
+                    progress.generated += 1
+                else:
+                    progress.rejected += 1
+            except Exception as e:
+                # Not checkpointed: a rerun retries it
+                progress.failed += 1
+                print(f"failed {slug}: {e}", file=sys.stderr, flush=True)
+                continue
+
+            async with batch_lock:
+                if row:
+                    batch.append(row)
+                processed.append(slug)
+                if len(processed) >= args.batch_size:
+                    await flush()
+            progress.report()
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(args.workers)))
+        async with batch_lock:
+            await flush()
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    progress.report(force=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk pre-generate RuleMate pages")
+    parser.add_argument("input", help="JSONL or plain-text file of questions")
+    parser.add_argument("--field", default="question", help="JSONL key holding the question")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent generations")
+    parser.add_argument("--rate", type=float, default=2.0, help="max new generations started per second (0 = unlimited)")
+    parser.add_argument("--batch-size", type=int, default=50, help="rows per INSERT batch")
+    parser.add_argument("--checkpoint", default="pregenerate.checkpoint", help="file of processed slugs ('' to disable)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,156 @@
+import os
+import re
+import math
+import threading
+from collections import defaultdict
+
+# Dice similarity over character trigrams of the normalized question.
+# Candidates must also agree on their key terms (see key_terms): a question
+# that differs in a number or a legal noun ("section 304" / "307", "marry
+# at 16" / "18", "murder" / "rape") has a different answer however close
+# the wording. 0 (or below) turns matching off.
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.65"))
+# Matches this close are the same question written differently (case,
+# punctuation, stopwords, plurals) and get a permanent slug alias
+ALIAS_THRESHOLD = float(os.getenv("SIMILARITY_ALIAS_THRESHOLD", "1.0"))
+
+# Words that don't change which rule a question is about
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did",
+    "can", "could", "should", "would", "will", "shall", "i", "my", "me",
+    "we", "you", "what", "whats", "which", "how", "much", "many", "tell",
+    "about", "for", "of", "in", "on", "to", "at", "by", "with", "and", "or",
+    "india", "indian", "please", "there", "any", "get", "it", "this", "that"
+}
+
+# Nouns that decide which rule applies (plurals folded, see fold). Numbers,
+# section numbers included, always count.
+KEY_TERMS = {
+    # offences
+    "murder", "rape", "theft", "robbery", "dacoity", "kidnapping", "assault",
+    "hurt", "cheating", "fraud", "forgery", "defamation", "dowry", "bribe",
+    "bribery", "extortion", "stalking", "harassment", "molestation", "suicide",
+    "abetment", "trespass", "riot", "smuggling", "drug", "gambling", "betting",
+    "hacking", "cybercrime", "acid", "eve", "ragging", "poaching",
+    # family / property / money
+    "marriage", "marry", "divorce", "alimony", "maintenance", "custody",
+    "adoption", "inheritance", "will", "property", "rent", "tenant",
+    "landlord", "eviction", "cheque", "loan", "salary", "gratuity", "pension",
+    "minor", "child", "woman", "senior",
+    # documents
+    "pan", "aadhaar", "passport", "voter", "ration", "license", "licence",
+    "visa", "birth", "death", "caste", "domicile", "insurance", "puc", "rc",
+    "gst", "itr", "pf", "epf",
+    # traffic
+    "helmet", "seatbelt", "drunk", "speeding", "signal", "parking", "triple",
+    "overloading", "horn", "toll", "fastag", "car", "bike", "scooter",
+    "truck", "bus", "auto", "tractor",
+}
+
+
+def fold(word: str) -> str:
+    # "fines" -> "fine", "rules" -> "rule"; leaves "pass", "bus"
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def normalize(text: str) -> str:
+    words = re.sub(r"[^a-z0-9 ]", " ", text.lower()).split()
+    return " ".join(fold(w) for w in words if w not in STOPWORDS)
+
+
+def key_terms(text: str) -> frozenset:
+    # Numbers and KEY_TERMS of a normalized question
+    return frozenset(
+        w for w in text.split() if w in KEY_TERMS or any(c.isdigit() for c in w)
+    )
+
+
+def trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class SimilarityIndex:
+    # In-memory inverted index: trigram -> ids of questions containing it.
+    #
+    # Lookups use prefix filtering: a question can only reach the Dice
+    # threshold if it shares at least one of the query's rarest trigrams,
+    # so only those posting lists are walked, then candidates are scored
+    # exactly.
+
+    def __init__(self):
+        self._slugs = []
+        self._grams = []
+        self._keys = []
+        self._ids = {}
+        self._postings = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._slugs)
+
+    def add(self, slug: str, question: str):
+        text = normalize(question)
+        grams = trigrams(text)
+        if not grams:
+            return
+
+        with self._lock:
+            if slug in self._ids:
+                return
+            doc_id = len(self._slugs)
+            self._ids[slug] = doc_id
+            self._slugs.append(slug)
+            self._grams.append(grams)
+            self._keys.append(key_terms(text))
+            for gram in grams:
+                self._postings[gram].append(doc_id)
+
+    def best_match(self, question: str, threshold: float = SIMILARITY_THRESHOLD):
+        # Returns (slug, score) of the closest stored question, or None
+        if threshold <= 0:
+            return None
+
+        text = normalize(question)
+        query = trigrams(text)
+        if not query:
+            return None
+
+        key = key_terms(text)
+        with self._lock:
+            # Dice >= t needs shared >= t * |q| / (2 - t)
+            t = min(threshold, 1.0)
+            min_shared = math.ceil(t * len(query) / (2 - t))
+            by_rarity = sorted(query, key=lambda g: len(self._postings.get(g, ())))
+            prefix = by_rarity[:max(len(query) - min_shared + 1, 1)]
+
+            candidates = set()
+            for gram in prefix:
+                candidates.update(self._postings.get(gram, ()))
+
+            best = None
+            best_score = threshold
+            for doc_id in candidates:
+                if self._keys[doc_id] != key:
+                    continue
+                grams = self._grams[doc_id]
+                score = 2 * len(query & grams) / (len(query) + len(grams))
+                if score >= best_score:
+                    best, best_score = doc_id, score
+
+            if best is None:
+                return None
+            return self._slugs[best], best_score
+
+
+def load(index: SimilarityIndex, cursor, batch_size=2000):
+    cursor.execute("SELECT slug, question FROM pages WHERE question IS NOT NULL")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for slug, question in rows:
+            index.add(slug, question)
+
+
+similar_questions = SimilarityIndex()
@@ -0,0 +1,89 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi.concurrency import run_in_threadpool
+
+import db
+
+# How long a follower in another worker waits for the leader's lock
+LOCK_TIMEOUT = float(os.getenv("SINGLEFLIGHT_LOCK_TIMEOUT", "60"))
+LOCK_POLL_INTERVAL = 0.05
+LOCK_POLL_MAX_INTERVAL = 0.5
+
+
+class SingleFlight:
+    # Coalesces concurrent calls for the same key inside one process:
+    # the first caller runs fn(), everyone else awaits its result.
+
+    def __init__(self):
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._inflight)
+
+    def __contains__(self, key):
+        return key in self._inflight
+
+    async def do(self, key, fn):
+        fut = self._inflight.get(key)
+        if fut is not None:
+            # shield so a cancelled follower doesn't cancel the leader's result
+            return await asyncio.shield(fut)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            # mark as retrieved, there may be no followers to see it
+            fut.exception()
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+@asynccontextmanager
+async def advisory_lock(key: str, timeout: float = LOCK_TIMEOUT):
+    # Cross-worker lock through a Postgres session advisory lock.
+    #
+    # The lock lives on a dedicated connection, not a pool one: the leader
+    # holds it for a whole LLM generation while it still needs pool
+    # connections for the re-check and the insert. Polls
+    # pg_try_advisory_lock instead of blocking in pg_advisory_lock so a
+    # waiting follower doesn't pin a threadpool worker.
+    # Yields True if the lock was taken, False if we gave up after timeout
+    # (callers then proceed unlocked rather than failing the request).
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = LOCK_POLL_INTERVAL
+
+    conn = await run_in_threadpool(db.dedicated_connection)
+    try:
+        acquired = await run_in_threadpool(db.try_advisory_lock, conn, key)
+        while not acquired and loop.time() + delay <= deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LOCK_POLL_MAX_INTERVAL)
+            acquired = await run_in_threadpool(db.try_advisory_lock, conn, key)
+        if acquired:
+            yield True
+    finally:
+        # Closing the session releases the lock
+        await run_in_threadpool(_close, conn)
+
+    if not acquired:
+        yield False
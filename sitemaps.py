@@ -0,0 +1,222 @@
+import os
+import time
+import threading
+from xml.sax.saxutils import escape
+
+import db
+from http_cache import CachedBody
+import metrics
+from pagination import CATEGORY_PAGE_SIZE, encode_cursor, category_url
+
+BASE_URL = "https://rulemate.in"
+
+# The sitemap protocol allows at most 50,000 URLs per file
+SHARD_SIZE = min(int(os.getenv("SITEMAP_SHARD_SIZE", "50000")), 50000)
+# Inserts in this worker invalidate right away; the TTL bounds how stale
+# shards can get after inserts made by other workers
+CACHE_TTL = float(os.getenv("SITEMAP_CACHE_TTL", "3600"))
+FETCH_SIZE = 2000
+
+# 🚨 Block dangerous patterns
+BAD_WORDS = [
+    ".env", "debug", "php", "aws", "config",
+    "login", "admin", "root", "sql", "backup",
+    "test", "tmp", "cache", "s3cfg"
+]
+
+FILE_SUFFIXES = (".ico", ".png", ".jpg", ".jpeg", ".js", ".css", ".json")
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = XML_HEADER + '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = "</urlset>\n"
+
+
+class ShardCache:
+    # Finished sitemap bodies, dropped wholesale whenever a page is inserted.
+    # The version counter stops a build that started before an insert from
+    # caching its (now stale) output.
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self):
+        with self._lock:
+            return self._version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                metrics.CACHE_REQUESTS.inc(cache="sitemap", result="miss")
+                return None
+            version, expires, value = entry
+            if version != self._version or time.monotonic() > expires:
+                del self._entries[key]
+                metrics.CACHE_REQUESTS.inc(cache="sitemap", result="miss")
+                return None
+            metrics.CACHE_REQUESTS.inc(cache="sitemap", result="hit")
+            return value
+
+    def put(self, key, version, value):
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = (version, time.monotonic() + self.ttl, value)
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+cache = ShardCache(CACHE_TTL)
+
+
+def invalidate():
+    cache.invalidate()
+
+
+def is_listable(slug: str) -> bool:
+    # Skip junk / dangerous slugs
+    if any(word in slug for word in BAD_WORDS):
+        return False
+
+    # Skip file-type slugs
+    if slug.endswith(FILE_SUFFIXES):
+        return False
+
+    # Skip very short or weird slugs
+    if len(slug) < 5 or "--" in slug:
+        return False
+
+    return True
+
+
+def url_entry(loc: str) -> str:
+    return f"<url><loc>{escape(loc)}</loc></url>\n"
+
+
+def shard_bounds():
+    # First slug of every SHARD_SIZE-th row, in slug order. Shard n covers
+    # bounds[n] <= slug < bounds[n + 1], so each shard is one index range scan.
+    bounds = cache.get("bounds")
+    if bounds is not None:
+        return bounds
+
+    version = cache.version()
+    with metrics.span("sitemap.shard_bounds"), db.cursor() as cursor:
+        cursor.execute("""
+            SELECT slug FROM (
+                SELECT slug, ROW_NUMBER() OVER (ORDER BY slug) AS rn
+                FROM pages
+            ) numbered
+            WHERE (rn - 1) %% %s = 0
+            ORDER BY slug
+        """, (SHARD_SIZE,))
+        bounds = [r[0] for r in cursor.fetchall()]
+
+    cache.put("bounds", version, bounds)
+    return bounds
+
+
+def stream_and_cache(key, chunks):
+    # Yield encoded chunks to the client and keep the finished body
+    version = cache.version()
+    parts = []
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        parts.append(data)
+        yield data
+    cache.put(key, version, CachedBody(b"".join(parts), "application/xml"))
+
+
+def index_xml() -> CachedBody:
+    entry = cache.get("index")
+    if entry is not None:
+        return entry
+
+    version = cache.version()
+    entries = [f"<sitemap><loc>{BASE_URL}/sitemap-main.xml</loc></sitemap>\n"]
+    for n in range(len(shard_bounds())):
+        entries.append(f"<sitemap><loc>{BASE_URL}/sitemap-pages-{n}.xml</loc></sitemap>\n")
+
+    entry = CachedBody((
+        XML_HEADER
+        + '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        + "".join(entries)
+        + "</sitemapindex>\n"
+    ).encode("utf-8"), "application/xml")
+
+    cache.put("index", version, entry)
+    return entry
+
+
+def main_chunks():
+    # Home page + 🔥 category pages
+    yield URLSET_OPEN
+    yield url_entry(f"{BASE_URL}/")
+
+    with metrics.span("sitemap.main_query"), db.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT category
+            FROM pages
+            WHERE category IS NOT NULL
+        """)
+        categories = cursor.fetchall()
+
+        # Last row of every full category page -> the ?after= cursor of the
+        # following page (skipped when nothing comes after it)
+        cursor.execute("""
+            SELECT category, question, slug FROM (
+                SELECT category, question, slug,
+                       ROW_NUMBER() OVER w AS rn,
+                       COUNT(*) OVER (PARTITION BY category) AS total
+                FROM pages
+                WHERE category IS NOT NULL
+                WINDOW w AS (PARTITION BY category ORDER BY question, slug)
+            ) numbered
+            WHERE rn %% %s = 0 AND rn < total
+            ORDER BY category, question, slug
+        """, (CATEGORY_PAGE_SIZE,))
+        page_starts = cursor.fetchall()
+
+    yield "".join(url_entry(f"{BASE_URL}{category_url(c[0])}") for c in categories)
+    yield "".join(
+        url_entry(f"{BASE_URL}{category_url(category, after=encode_cursor(question, slug))}")
+        for category, question, slug in page_starts
+    )
+    yield URLSET_CLOSE
+
+
+def page_chunks(lower, upper):
+    # 🔥 question pages in [lower, upper), read through a server-side cursor
+    # so the whole shard never sits in memory at once
+    yield URLSET_OPEN
+
+    with db.connection() as conn:
+        with conn.cursor(name="sitemap_shard") as cursor:
+            cursor.itersize = FETCH_SIZE
+            if upper is None:
+                cursor.execute(
+                    "SELECT slug FROM pages WHERE slug >= %s ORDER BY slug",
+                    (lower,)
+                )
+            else:
+                cursor.execute(
+                    "SELECT slug FROM pages WHERE slug >= %s AND slug < %s ORDER BY slug",
+                    (lower, upper)
+                )
+
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                yield "".join(
+                    url_entry(f"{BASE_URL}/{slug}")
+                    for slug in (r[0].lower() for r in rows)
+                    if is_listable(slug)
+                )
+
+    yield URLSET_CLOSE
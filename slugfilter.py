@@ -0,0 +1,112 @@
+import os
+import re
+import math
+import hashlib
+import threading
+
+# Bloom filter of every slug in pages, checked by /{slug} before touching
+# Postgres. A miss means the page definitely doesn't exist; a hit (or a
+# false positive, ~SLUG_FILTER_ERROR_RATE of unknown slugs) goes to the DB.
+SLUG_FILTER_CAPACITY = int(os.getenv("SLUG_FILTER_CAPACITY", "1000000"))
+SLUG_FILTER_ERROR_RATE = float(os.getenv("SLUG_FILTER_ERROR_RATE", "0.001"))
+
+# Scanner / bot probes: .env, wp-login.php, aws-config, /admin, ...
+# A dash-separated word from the old bad_words list, anything with a dot,
+# or the usual CMS / tooling prefixes.
+PROBE_RE = re.compile(
+    r"(?:^|-)(?:debug|php|aws|config|login|admin|root|sql|backup|test|tmp|cache)(?:-|$)"
+    r"|\."
+    r"|^(?:wp|cgi|phpmyadmin|xmlrpc|actuator|autodiscover)(?:-|$)"
+)
+
+
+def is_probe(slug: str) -> bool:
+    return PROBE_RE.search(slug) is not None
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class SlugFilter:
+    # Until load() has finished (or while the cross-worker listener is
+    # down) every slug "might exist", so nothing is ever wrongly 404'd.
+
+    def __init__(self, capacity=SLUG_FILTER_CAPACITY, error_rate=SLUG_FILTER_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ready = False
+        self._bloom = None
+        self._loading = None  # slugs added while a reload is running
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        bloom = self._bloom
+        return bloom.count if bloom else 0
+
+    def might_exist(self, slug: str) -> bool:
+        bloom = self._bloom
+        if not self.ready or bloom is None:
+            return True
+        return slug in bloom
+
+    def add(self, slug: str):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(slug)
+            if self._loading is not None:
+                self._loading.append(slug)
+
+    def mark_stale(self):
+        self.ready = False
+
+    def load(self, conn, batch_size=5000):
+        with self._lock:
+            self._loading = []
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM pages")
+                total = cursor.fetchone()[0]
+            # Headroom so the error rate holds as new pages come in
+            bloom = BloomFilter(max(self.capacity, total * 2), self.error_rate)
+
+            with conn.cursor(name="slug_filter_load") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute("SELECT slug FROM pages")
+                for (slug,) in cursor:
+                    bloom.add(slug)
+
+            with self._lock:
+                for slug in self._loading:
+                    bloom.add(slug)
+                self._bloom = bloom
+                self.ready = True
+        finally:
+            with self._lock:
+                self._loading = None
+
+
+known_slugs = SlugFilter()
@@ -0,0 +1,35 @@
+import re
+import json
+import html
+
+SLOT_PATTERN = re.compile(r"<!--slot:([a-z_]+)-->")
+
+
+class Template:
+    # Page shell parsed once into literal chunks and named <!--slot:name-->
+    # holes. render() is a single join: no full-document .replace() passes.
+
+    def __init__(self, source, **defaults):
+        pieces = SLOT_PATTERN.split(source)
+        self.literals = pieces[0::2]
+        self.slots = pieces[1::2]
+        self.defaults = defaults
+
+    def render(self, **values):
+        out = [self.literals[0]]
+        for name, literal in zip(self.slots, self.literals[1:]):
+            value = values.get(name)
+            out.append(self.defaults.get(name, "") if value is None else value)
+            out.append(literal)
+        return "".join(out)
+
+
+def escape_html(text) -> str:
+    # Text going into element content or a quoted attribute
+    return html.escape(str(text), quote=True)
+
+
+def js_literal(value) -> str:
+    # Any value going into a <script> block (JS or JSON-LD); "</" is split
+    # so the data can never close the script tag early
+    return json.dumps(value).replace("</", "<\\/")
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+# main builds the OpenAI client at import; nothing here calls it
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import main  # noqa: E402
+from aliases import AliasMap  # noqa: E402
+
+
+class StoredPages(set):
+    # Stands in for the slug filter: exact, no false positives
+    def might_exist(self, slug):
+        return slug in self
+
+
+@pytest.fixture(autouse=True)
+def pages(monkeypatch):
+    stored = StoredPages({
+        "what-fine",
+        "16-year-old-drive-a-scooter-in-india",
+        "fine-for-no-helmet",
+        "section-304-ipc-punishment",
+    })
+    aliases = AliasMap()
+    aliases.add("helmet-fine", "fine-for-no-helmet")
+    aliases.add("12-helmet-rules", "fine-for-no-helmet")
+    monkeypatch.setattr(main, "known_slugs", stored)
+    monkeypatch.setattr(main, "slug_aliases", aliases)
+
+
+@pytest.mark.parametrize("slug, canonical", [
+    # stored pages stay where they are
+    ("fine-for-no-helmet", "fine-for-no-helmet"),
+    ("16-year-old-drive-a-scooter-in-india", "16-year-old-drive-a-scooter-in-india"),
+    # case and whitespace
+    ("Fine-For-No-Helmet", "fine-for-no-helmet"),
+    (" section-304-ipc-punishment ", "section-304-ipc-punishment"),
+    # en / em dashes
+    ("fine–for–no–helmet", "fine-for-no-helmet"),
+    ("fine—for—no—helmet", "fine-for-no-helmet"),
+    # old numbered slugs that aren't pages lose the number
+    ("12-what-is-fine", "what-fine"),
+    ("3-What-Is-Fine", "what-fine"),
+    # aliases, numbered or not
+    ("helmet-fine", "fine-for-no-helmet"),
+    ("12-helmet-rules", "fine-for-no-helmet"),
+    # unknown slugs pass through for dynamic_page to 404
+    ("no-such-page", "no-such-page"),
+])
+def test_canonical_slug(slug, canonical):
+    assert main.canonical_slug(slug) == canonical
+
+
+def test_unnumbered_slug():
+    assert main.unnumbered_slug("12-what-is-fine") == "what-fine"
+    assert main.unnumbered_slug("what-is-fine") == "what-is-fine"
@@ -0,0 +1,104 @@
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+
+# main builds the OpenAI client at import; nothing here calls it
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import db  # noqa: E402
+import main  # noqa: E402
+from pagination import CATEGORY_PAGE_SIZE  # noqa: E402
+
+ROWS = 3 * CATEGORY_PAGE_SIZE + 23
+LINK_RE = re.compile(r'<div class="related-q"><a href="/([^"]+)"')
+PREV_RE = re.compile(r'<a rel="prev" href="([^"]+)"')
+NEXT_RE = re.compile(r'<a rel="next" href="([^"]+)"')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # The keyset queries run as they are on sqlite (row values, LIMIT)
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.execute("CREATE TABLE pages (slug TEXT PRIMARY KEY, question TEXT, category TEXT)")
+    # Three rows per question, so the slug half of the keyset matters
+    conn.executemany(
+        "INSERT INTO pages VALUES (?, ?, 'traffic')",
+        [(f"slug-{i:04d}", f"question {i // 3:04d}") for i in range(ROWS)]
+    )
+
+    class Cursor:
+        def __init__(self):
+            self._cur = conn.cursor()
+
+        def execute(self, sql, params=()):
+            self._cur.execute(sql.replace("%s", "?"), params)
+
+        def fetchone(self):
+            return self._cur.fetchone()
+
+        def fetchall(self):
+            return self._cur.fetchall()
+
+    @contextmanager
+    def cursor():
+        yield Cursor()
+
+    monkeypatch.setattr(db, "cursor", cursor)
+    main.page_cache.clear()
+    yield TestClient(main.app)
+    main.page_cache.clear()
+
+
+def get_page(client, url):
+    response = client.get(url, follow_redirects=False)
+    assert response.status_code == 200, url
+    html = response.text
+    prev_url = PREV_RE.search(html)
+    next_url = NEXT_RE.search(html)
+    return (
+        LINK_RE.findall(html),
+        prev_url and prev_url.group(1).replace("&amp;", "&"),
+        next_url and next_url.group(1).replace("&amp;", "&"),
+    )
+
+
+def test_walk_forward_and_back(client):
+    expected = [f"slug-{i:04d}" for i in range(ROWS)]
+
+    pages, urls = [], []
+    url = "/category/traffic"
+    while url:
+        slugs, prev_url, url_next = get_page(client, url)
+        pages.append(slugs)
+        urls.append((url, prev_url))
+        url = url_next
+    assert [slug for page in pages for slug in page] == expected
+    assert len(pages) == 4
+
+    # Page 1 has no prev; page 2's prev is the bare URL, not ?before=
+    assert urls[0][1] is None
+    assert urls[1][1] == "/category/traffic"
+    assert urls[2][1].startswith("/category/traffic?before=")
+
+    # Back from the last page through the prev links
+    back = []
+    url = urls[-1][0]
+    while url:
+        slugs, prev_url, _ = get_page(client, url)
+        back.insert(0, slugs)
+        url = prev_url
+    assert back == pages
+
+
+def test_before_landing_on_first_page_redirects(client):
+    _, _, page2_url = get_page(client, "/category/traffic")
+    slugs, _, _ = get_page(client, page2_url)
+    cursor = main.encode_cursor(f"question {int(slugs[0][5:]) // 3:04d}", slugs[0])
+
+    response = client.get(f"/category/traffic?before={cursor}", follow_redirects=False)
+    assert response.status_code == 301
+    assert response.headers["location"] == "/category/traffic"
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+# main builds the OpenAI client at import; nothing here calls it
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from main import has_legal_keyword  # noqa: E402
+
+
+@pytest.mark.parametrize("question", [
+    "Is dowry illegal?",
+    "Got fined by cop",
+    "arrested wrongly?",
+    "taxation on gifts",
+    "penalties for late filing",
+    "Is it legally allowed?",
+    "helmet rules for kids",
+    "Can police seize my licence?",
+])
+def test_keyword_forms_match(question):
+    assert has_legal_keyword(question)
+
+
+@pytest.mark.parametrize("question", [
+    "contract of my cat",
+    "best pizza near me",
+])
+def test_unrelated_words_do_not_match(question):
+    assert not has_legal_keyword(question)
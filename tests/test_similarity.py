@@ -0,0 +1,63 @@
+import pytest
+
+from similarity import ALIAS_THRESHOLD, SimilarityIndex, key_terms, normalize
+
+
+STORED = {
+    "section-304-ipc-punishment": "Section 304 IPC punishment",
+    "is-it-legal-to-marry-at-18": "Is it legal to marry at 18?",
+    "punishment-for-murder-under-ipc": "punishment for murder under IPC",
+    "apply-for-pan-card-online": "apply for PAN card online",
+    "fine-for-drunk-driving-in-india": "What is the fine for drunk driving in India?",
+    "fine-for-no-helmet": "What is the fine for no helmet?",
+}
+
+
+@pytest.fixture
+def index():
+    index = SimilarityIndex()
+    for slug, question in STORED.items():
+        index.add(slug, question)
+    return index
+
+
+@pytest.mark.parametrize("question", [
+    "Section 307 IPC punishment",
+    "Is it legal to marry at 16?",
+    "punishment for rape under IPC",
+    "apply for ration card online",
+    "fine for drunk driving on a bike",
+    "fine for no seatbelt",
+])
+def test_different_key_term_is_not_reused(index, question):
+    assert index.best_match(question) is None
+
+
+@pytest.mark.parametrize("question, slug", [
+    ("fine for drunk driving?", "fine-for-drunk-driving-in-india"),
+    ("What is the fine for Drunk Driving in India", "fine-for-drunk-driving-in-india"),
+    ("Fines for drunk driving", "fine-for-drunk-driving-in-india"),
+    ("section 304 IPC punishment?", "section-304-ipc-punishment"),
+    ("drunk driving fine", "fine-for-drunk-driving-in-india"),
+    ("fine for not wearing helmet in India", "fine-for-no-helmet"),
+    ("no helmet fine", "fine-for-no-helmet"),
+    ("punishment for murder", "punishment-for-murder-under-ipc"),
+])
+def test_wording_variants_are_reused(index, question, slug):
+    match = index.best_match(question)
+    assert match is not None
+    assert match[0] == slug
+
+
+def test_key_terms_are_numbers_and_legal_nouns():
+    assert key_terms(normalize("Punishment under Section 304A IPC for murder")) == {"304a", "murder"}
+    assert key_terms(normalize("marry at 16")) != key_terms(normalize("marry at 18"))
+
+
+def test_threshold_zero_turns_matching_off(index):
+    assert index.best_match("Section 304 IPC punishment", threshold=0) is None
+
+
+def test_only_rewordings_reach_the_alias_threshold(index):
+    assert index.best_match("Fines for drunk driving", ALIAS_THRESHOLD) is not None
+    assert index.best_match("drunk driving fine", ALIAS_THRESHOLD) is None
@@ -0,0 +1,12 @@
+import contextvars
+
+# Per-request resource counters (DB checkouts / new connections, LLM calls).
+# Nothing is counted unless a caller installs a Counter for the current
+# context; the load-test harness does that once per request.
+current = contextvars.ContextVar("request_usage", default=None)
+
+
+def count(name: str, n: int = 1):
+    counter = current.get()
+    if counter is not None:
+        counter[name] += n